@@ -0,0 +1,131 @@
+"""Memory-bounded LRU cache for aggregates shared across sessions.
+
+Most sessions look at the same few date presets, so view aggregates are
+cached once per server process and reused by every session. Entries are
+evicted least recently used first once their estimated size exceeds the
+configured budget. Cached values are shared and must not be mutated.
+
+The same cache holds built chart figures, keyed by a hash of the aggregate
+they were built from and sized by an estimate of their JSON spec.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_size(value):
+    """Approximate memory held by a cached value, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if hasattr(value, '__dict__'):
+        # Objects such as rollup.CategoryBreakdown, by the arrays they hold
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+def _hash_into(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode())
+        for column, dtype in value.dtypes.items():
+            digest.update(str(dtype).encode())
+            if isinstance(dtype, pd.CategoricalDtype):
+                # Category order decides legend and color order
+                digest.update(pd.util.hash_array(dtype.categories.to_numpy()).tobytes())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            _hash_into(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+
+def content_hash(*values):
+    """Digest of the values' contents; equal frames hash alike however they were computed."""
+    digest = hashlib.blake2b(digest_size=16)
+    _hash_into(digest, values)
+    return digest.hexdigest()
+
+
+class AggregateCache:
+    def __init__(self, max_bytes, sizeof=estimate_size):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                return self._hit(key)
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = threading.Event()
+        if pending is not None:
+            # Another session is computing the same entry, wait for it
+            pending.wait()
+            with self._lock:
+                if key in self._entries:
+                    return self._hit(key)
+            return compute()
+
+        try:
+            value = compute()
+            with self._lock:
+                self.misses += 1
+                self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+    def _hit(self, key):
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def _store(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
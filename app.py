@@ -1,9 +1,11 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import numpy as np
+import io
+import threading
+import uuid
 from datetime import datetime, timedelta
 
+import profiling
+
 # Page configuration must be the first Streamlit command
 st.set_page_config(
     page_title="Time Entry Analysis Dashboard",
@@ -11,8 +13,9 @@ st.set_page_config(
     layout="wide"
 )
 
-# Modern UI styling - inspired by shadcn/ui with adaptive theming
-st.markdown("""
+# Modern UI styling - inspired by shadcn/ui with adaptive theming. The login
+# page gets only the styles it uses; the rest follows after sign-in.
+LOGIN_CSS = """
 <style>
     /* Modern Font */
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
@@ -27,18 +30,6 @@ st.markdown("""
         font-weight: 600 !important;
     }
     
-    /* Container styling */
-    [data-testid="stVerticalBlock"] {
-        border-radius: 8px;
-    }
-    
-    /* Card-like components */
-    .stPlotlyChart, div[data-testid="stDataFrame"] {
-        border-radius: 12px;
-        padding: 1rem;
-        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
-    }
-    
     /* Button styling */
     button[kind="primary"], .stButton>button {
         border-radius: 6px !important;
@@ -60,6 +51,31 @@ st.markdown("""
         border-radius: 6px !important;
     }
     
+    /* Login container */
+    .login-container {
+        max-width: 400px;
+        margin: 0 auto;
+        padding: 2rem;
+        border-radius: 12px;
+        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
+    }
+</style>
+"""
+
+DASHBOARD_CSS = """
+<style>
+    /* Container styling */
+    [data-testid="stVerticalBlock"] {
+        border-radius: 8px;
+    }
+    
+    /* Card-like components */
+    .stPlotlyChart, div[data-testid="stDataFrame"] {
+        border-radius: 12px;
+        padding: 1rem;
+        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
+    }
+    
     /* Dropdown styling */
     [data-baseweb="select"] {
         border-radius: 6px !important;
@@ -76,26 +92,6 @@ st.markdown("""
         min-width: 250px !important;
     }
     
-    /* Login container */
-    .login-container {
-        max-width: 400px;
-        margin: 0 auto;
-        padding: 2rem;
-        border-radius: 12px;
-        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1), 0 2px 4px -1px rgba(0, 0, 0, 0.06);
-    }
-    
-    /* Tabs styling */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        border-radius: 4px 4px 0px 0px;
-        padding: 10px 16px;
-        font-weight: 500;
-    }
-    
     /* Color scheme - Can be adjusted to match your brand */
     .main-accent {
         color: #6366f1;
@@ -105,7 +101,9 @@ st.markdown("""
         background-color: #6366f1;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(LOGIN_CSS, unsafe_allow_html=True)
 
 # Get password from secrets or use default
 try:
@@ -115,6 +113,80 @@ except Exception as e:
     # Fallback password
     APP_PASSWORD = "timecategorization"
 
+# Read an optional setting from Streamlit secrets
+def get_setting(section, key, default):
+    try:
+        return st.secrets[section].get(key, default)
+    except Exception:
+        return default
+
+# Pick up rows appended to the timesheet, checking every `refresh_seconds`
+# on a background thread (0 checks on each rerun instead)
+INCREMENTAL_INGEST = get_setting("data", "incremental", True)
+REFRESH_SECONDS = get_setting("data", "refresh_seconds", 30)
+
+# Timesheet export: one CSV, or a directory or glob of shards (e.g. one per
+# month) parsed in parallel by up to `workers` processes
+DATA_PATH = get_setting("data", "path", "classified_timesheet.csv")
+INGEST_WORKERS = get_setting("data", "workers", None)
+
+# Out-of-core mode for exports larger than memory: read the file in chunks of
+# this many rows and keep only the aggregates resident
+STREAM_CHUNK_ROWS = get_setting("data", "stream_chunk_rows", None)
+
+# Where the summary and view aggregations run: "pandas" over the in-memory
+# rollup, or "sqlite" to push date filters and groupbys down to SQLite
+QUERY_BACKEND = get_setting("data", "backend", "pandas")
+
+# Memory budget for view aggregates shared across sessions
+AGGREGATE_CACHE_MB = get_setting("cache", "max_memory_mb", 256)
+
+# Memory budget for built chart figures, measured by their estimated JSON size
+FIGURE_CACHE_MB = get_setting("cache", "figure_memory_mb", 64)
+
+# Opt-in per-rerun stage timings, shown in the sidebar and appended to a log
+PROFILING = get_setting("profiling", "enabled", False)
+PROFILING_LOG = get_setting("profiling", "log_path", "profiling.jsonl")
+
+# The SQLite store keeps one database per dataset version for all sessions
+@st.cache_resource
+def get_sqlite_store():
+    from query_backends import SqliteStore
+    return SqliteStore()
+
+# Load and prepare data once per server process. The dataset holds the raw
+# frame and the day x classification x service item x employee rollup shared
+# by the chart tabs, and folds appended rows into both. cache_resource hands
+# every rerun the same objects without pickling, and the frame itself is a
+# read-only view of the memory-mapped snapshot. The refresher rebuilds it in
+# the background and swaps in each new version once its query database or
+# indexes are ready, so reruns never wait on a reload.
+@st.cache_resource
+def load_dataset():
+    from dataset import DatasetRefresher, LoadedData, open_dataset
+    # The SQLite backend queries its own database; only pandas reads the day and filter indexes
+    prepare = get_sqlite_store().queries if QUERY_BACKEND == 'sqlite' else LoadedData.build_indexes
+    return DatasetRefresher(
+        open_dataset(DATA_PATH, INGEST_WORKERS, STREAM_CHUNK_ROWS), REFRESH_SECONDS if INCREMENTAL_INGEST else None, prepare
+    )
+
+# Warm the process up while the login page is shown. The first session to
+# open starts a thread that loads the dataset and imports the chart stack,
+# so both are ready or well under way once the password is accepted; a
+# rerun that gets there first waits on the same cached load.
+def prewarm():
+    load_dataset()
+    import charts  # noqa: F401
+    import explorer  # noqa: F401
+
+@st.cache_resource
+def start_prewarm():
+    thread = threading.Thread(target=prewarm, name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+start_prewarm()
+
 # Initialize session state for authentication
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
@@ -152,7 +224,27 @@ if not st.session_state.authenticated:
     # Stop app execution for unauthenticated users
     st.stop()
 
-# App starts here for authenticated users
+# App starts here for authenticated users. The analytics stack is imported
+# only now, so the login page never waits on it.
+import pandas as pd
+import plotly.express as px
+import numpy as np
+
+from aggregate_cache import AggregateCache, content_hash
+import charts
+import explorer
+from date_filters import DATE_RANGE_OPTIONS, comparison_bounds, date_bounds, filter_dataframe, get_start_date
+from periods import GRAINS
+from query_backends import PandasQueries
+
+st.markdown(DASHBOARD_CSS, unsafe_allow_html=True)
+
+if PROFILING:
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex[:12]
+    profile = profiling.RerunProfile(st.session_state.session_id)
+else:
+    profile = profiling.NullProfile()
 
 # Show user info and sign out button in sidebar
 with st.sidebar:
@@ -162,183 +254,266 @@ with st.sidebar:
         st.session_state.user_info = None
         st.rerun()
 
-# Load and prepare data
-@st.cache_data
-def load_data():
-    df = pd.read_csv('classified_timesheet.csv')
-    df['date'] = pd.to_datetime(df['local_date'], errors='coerce')
-    df['month_year'] = df['date'].dt.strftime('%Y-%m')
-    return df
-
 # Page header with improved styling
 st.markdown("<h1 style='font-size: 2rem; margin-bottom: 0.5rem;'>Time Entry Analysis Dashboard</h1>", unsafe_allow_html=True)
 st.markdown("<p style='font-size: 1.1rem; margin-bottom: 2rem;'>Analyze and visualize categorized time entries</p>", unsafe_allow_html=True)
 
 # Load data
-with st.spinner("Loading data..."):
-    df = load_data()
+with st.spinner("Loading data..."), profile.stage('load') as stage:
+    refresher = load_dataset()
+    data = refresher.latest()
+    df, rollup_df = data.frame, data.rollup
+    stage['rows_out'] = len(rollup_df) if df is None else len(df)
+
+with profile.stage('backend.' + QUERY_BACKEND):
+    queries = get_sqlite_store().queries(data) if QUERY_BACKEND == 'sqlite' else PandasQueries(data)
 
 # Date filter section with nicer styling
 st.sidebar.markdown("## Filters")
 st.sidebar.markdown("<div style='height: 0.5rem'></div>", unsafe_allow_html=True)
 
-# Date range options
-date_range_options = {
-    'all': 'All Time',
-    '3d': 'Last 3 Days',
-    '1w': 'Last Week', 
-    '1m': 'Last Month',
-    '3m': 'Last 3 Months',
-    'custom': 'Custom Range'
-}
-
 date_range = st.sidebar.selectbox(
     "Date Range",
-    options=list(date_range_options.keys()),
-    format_func=lambda x: date_range_options[x],
+    options=list(DATE_RANGE_OPTIONS.keys()),
+    format_func=lambda x: DATE_RANGE_OPTIONS[x],
     index=0
 )
 
-# Function to get start date based on selection
-def get_start_date(selection):
-    today = datetime.now().date()
-    if selection == '3d':
-        return today - timedelta(days=3)
-    elif selection == '1w':
-        return today - timedelta(days=7)
-    elif selection == '1m':
-        return today - timedelta(days=30)
-    elif selection == '3m':
-        return today - timedelta(days=90)
-    else:
-        return None  # All time
+# Time bucketing of the trend charts
+time_grain = st.sidebar.selectbox(
+    "Time Grain",
+    options=list(GRAINS.keys()),
+    format_func=lambda x: GRAINS[x],
+    index=list(GRAINS).index('month')
+)
 
 # Custom date range if selected
 start_date = None
 end_date = None
 
+overall = queries.summary()
+data_min_date, data_max_date = overall['first'], overall['last']
+
 if date_range == 'custom':
-    min_date = df['date'].min().date() if not pd.isna(df['date'].min()) else datetime(2020, 1, 1).date()
-    max_date = df['date'].max().date() if not pd.isna(df['date'].max()) else datetime.now().date()
-    
-    start_date = st.sidebar.date_input(
-        "Start Date:",
-        min_value=min_date,
-        max_value=max_date,
-        value=min_date
-    )
+    min_date = data_min_date.date() if not pd.isna(data_min_date) else datetime(2020, 1, 1).date()
+    max_date = data_max_date.date() if not pd.isna(data_max_date) else datetime.now().date()
     
-    end_date = st.sidebar.date_input(
-        "End Date:",
+    # Window totals come from the day index, so the slider stays live
+    start_date, end_date = st.sidebar.slider(
+        "Date Window:",
         min_value=min_date,
-        max_value=max_date,
-        value=max_date
+        max_value=max(max_date, min_date + timedelta(days=1)),
+        value=(min_date, max_date),
+        format="YYYY-MM-DD"
     )
 else:
     if date_range != 'all':
         start_date = get_start_date(date_range)
     else:
         # For 'all', use the min/max dates in the dataset
-        start_date = df['date'].min().date() if not pd.isna(df['date'].min()) else None
+        start_date = data_min_date.date() if not pd.isna(data_min_date) else None
     
     end_date = datetime.now().date()
 
-# Filter data based on date selection
-def filter_dataframe(df, date_range, start_date, end_date):
-    filtered_df = df.copy()
-    
-    if date_range == 'all':
-        pass  # No filtering needed
-    elif date_range == 'custom':
-        if start_date and end_date:
-            # Add one day to end_date to make it inclusive
-            end_date_inclusive = end_date + timedelta(days=1)
-            filtered_df = filtered_df[(filtered_df['date'].dt.date >= start_date) & 
-                                     (filtered_df['date'].dt.date < end_date_inclusive)]
-    else:
-        # Handle preset ranges
-        if start_date:
-            filtered_df = filtered_df[filtered_df['date'].dt.date >= start_date]
-    
-    return filtered_df
+bounds = date_bounds(date_range, start_date, end_date)
+
+# Cross-filter: besides the date window, every view keeps only the rows of
+# the selected categories, service items and employees. Clicking a bar or a
+# category sector selects its key, or deselects it if already selected.
+# Clickable charts are filtered by the other dimensions only and highlight
+# their own selection, so further keys stay there to be clicked.
+DIMENSION_LABELS = {
+    'classification': "Category",
+    'service item': "Service Item",
+    'employee_id': "Employee",
+}
+CLICKABLE_DIMENSIONS = {'category': 'classification', 'service': 'service item', 'users': 'employee_id'}
+FILTER_KEYS = {column: 'filter_' + column.replace(' ', '_') for column in DIMENSION_LABELS}
+
+filter_options = {
+    'classification': sorted(rollup_df['classification'].cat.categories),
+    'service item': sorted(rollup_df['service item'].cat.categories),
+    'employee_id': data.employees['name'].sort_values().index.tolist(),
+}
+for column, options in filter_options.items():
+    # Keys gone from a reloaded dataset drop out of the selection
+    selected = st.session_state.get(FILTER_KEYS[column]) or []
+    if selected:
+        options = set(options)
+        known = [key for key in selected if key in options]
+        if len(known) < len(selected):
+            st.session_state[FILTER_KEYS[column]] = known
+
+def clear_filters():
+    for key in FILTER_KEYS.values():
+        st.session_state[key] = []
 
-filtered_df = filter_dataframe(df, date_range, start_date, end_date)
+def toggle_filter(chart_key, column, keys):
+    selected = list(st.session_state.get(FILTER_KEYS[column], []))
+    for key in charts.clicked_keys(st.session_state[chart_key].selection.points, keys):
+        if key in selected:
+            selected.remove(key)
+        else:
+            selected.append(key)
+    st.session_state[FILTER_KEYS[column]] = selected
+
+for column, label in DIMENSION_LABELS.items():
+    st.sidebar.multiselect(
+        label,
+        options=filter_options[column],
+        format_func=(lambda x: data.employees.at[x, 'name']) if column == 'employee_id' else str,
+        placeholder="All",
+        key=FILTER_KEYS[column]
+    )
+
+# (column, keys) pairs in a fixed order, so equal selections share cache entries
+filters = tuple(
+    (column, tuple(sorted(st.session_state[FILTER_KEYS[column]])))
+    for column in DIMENSION_LABELS if st.session_state[FILTER_KEYS[column]]
+)
+st.sidebar.button("Clear Filters", on_click=clear_filters, disabled=not filters)
+
+def selected_filter_keys(column):
+    return dict(filters).get(column, ())
+
+# A streaming dataset has no rows in memory; the Data Explorer scans for them
+filtered_df = None
+if df is not None:
+    with profile.stage('filter.frame', len(df)) as stage:
+        filtered_df = filter_dataframe(df, date_range, start_date, end_date)
+        stage['rows_out'] = len(filtered_df)
 
 # Summary statistics
 st.sidebar.markdown("### Summary")
-st.sidebar.markdown(f"**Total Hours:** {filtered_df['hours'].sum():.1f}")
-st.sidebar.markdown(f"**Total Entries:** {len(filtered_df)}")
-min_date_str = filtered_df['date'].min().strftime('%b %Y') if not pd.isna(filtered_df['date'].min()) else "N/A"
-max_date_str = filtered_df['date'].max().strftime('%b %Y') if not pd.isna(filtered_df['date'].max()) else "N/A"
+with profile.stage('summary'):
+    summary = queries.summary(bounds, filters)
+st.sidebar.markdown(f"**Total Hours:** {summary['hours']:.1f}")
+st.sidebar.markdown(f"**Total Entries:** {summary['entries']}")
+filtered_min_date, filtered_max_date = summary['first'], summary['last']
+min_date_str = filtered_min_date.strftime('%b %Y') if not pd.isna(filtered_min_date) else "N/A"
+max_date_str = filtered_max_date.strftime('%b %Y') if not pd.isna(filtered_max_date) else "N/A"
 st.sidebar.markdown(f"**Date Range:** {min_date_str} to {max_date_str}")
 
-# Create tabs with shadcn-inspired styling
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
-    "Category Analysis", 
-    "Service Item Analysis", 
-    "Time Trends",
-    "User Analysis",
-    "Data Explorer"
-])
-
-# Tab 1: Category Analysis
-with tab1:
-    # Category data
-    category_hours = filtered_df.groupby('classification')['hours'].sum().reset_index()
-    category_hours = category_hours.sort_values('hours', ascending=False)
+# View navigation. Unlike st.tabs, which runs every tab body on each rerun,
+# only the selected view's aggregations and charts are computed.
+views = {
+    'category': "Category Analysis",
+    'service': "Service Item Analysis",
+    'trends': "Time Trends",
+    'users': "User Analysis",
+    'compare': "Period Comparison",
+    'explorer': "Data Explorer"
+}
+
+active_view = st.radio(
+    "View",
+    options=list(views.keys()),
+    format_func=lambda x: views[x],
+    horizontal=True,
+    label_visibility="collapsed",
+    key="active_view"
+)
+profile.view = active_view
+
+# View aggregates are cached per filter state and shared by all sessions, so
+# everyone opening the same preset reuses one computation
+@st.cache_resource
+def get_aggregate_cache():
+    return AggregateCache(int(AGGREGATE_CACHE_MB * 1024 * 1024))
+
+aggregate_cache = get_aggregate_cache()
+
+# Figures are cached by the content of the aggregate they show, so equal
+# aggregates reached through different filters share one figure
+@st.cache_resource
+def get_figure_cache():
+    return AggregateCache(int(FIGURE_CACHE_MB * 1024 * 1024), sizeof=charts.figure_size)
+
+figure_cache = get_figure_cache()
+
+# With a `breakdown` column, the window's hours by that column and
+# classification behind a view's drilldown, so picking another service item
+# or employee is a lookup in the cached breakdown. Views with a clickable
+# chart leave out the filter on that chart's dimension.
+def get_view_aggregates(view, breakdown=None):
+    computed = []
+    view_filters = tuple((column, keys) for column, keys in filters if column != CLICKABLE_DIMENSIONS.get(view))
+
+    def compute():
+        computed.append(True)
+        if breakdown is None:
+            return queries.view_aggregates(view, bounds, time_grain, view_filters)
+        return queries.category_breakdown(breakdown, bounds, view_filters)
+
+    grain = time_grain if breakdown is None else None
+    cache_key = (view, date_range, start_date, end_date, grain, breakdown, view_filters, data.version)
+    stage_name = 'aggregate.' + view + ('.breakdown' if breakdown else '')
+    with profile.stage(stage_name) as stage:
+        aggregates = aggregate_cache.get_or_compute(cache_key, compute)
+        stage['cached'] = not computed
+    return aggregates
+
+# Build a figure, or reuse one built from the same aggregate, and render
+# it, timing the two separately. With `filter_by`, a (column, keys) pair
+# with the key of each of the figure's bars, clicks toggle those keys in
+# the cross-filter; the builder's last argument is then the selected keys
+# it highlights.
+def show_chart(build, *args, filter_by=None):
+    built = []
+
+    def compute():
+        built.append(True)
+        return build(*args)
+
+    with profile.stage('figure.' + build.__name__) as stage:
+        cache_key = (build.__name__, content_hash(*args), st.context.theme.type)
+        fig = figure_cache.get_or_compute(cache_key, compute)
+        stage['cached'] = not built
+    with profile.stage('render.' + build.__name__):
+        if filter_by is None:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            column, keys = filter_by
+            chart_key = 'chart_' + build.__name__
+            st.plotly_chart(
+                fig,
+                use_container_width=True,
+                key=chart_key,
+                on_select=lambda: toggle_filter(chart_key, column, keys),
+                selection_mode='points'
+            )
+
+# Category Analysis
+def show_category_analysis():
+    aggregates = get_view_aggregates('category')
+    category_hours = aggregates['category_hours']
     
     col1, col2 = st.columns([3, 2])
     
+    categories = ('classification', category_hours['classification'].tolist())
+    selected = selected_filter_keys('classification')
     with col1:
         st.subheader("Hours by Category")
-        fig = px.bar(
-            category_hours, 
-            x='classification', 
-            y='hours',
-            color='hours',
-            labels={'classification': 'Category', 'hours': 'Total Hours'},
-            title="Total Hours by Category",
-            color_continuous_scale=px.colors.sequential.Viridis
-        )
-        fig.update_layout(
-            xaxis={'categoryorder':'total descending'},
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={'family': 'Inter, sans-serif'},
-            margin=dict(l=40, r=40, t=60, b=40),
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(charts.category_bar, category_hours, selected, filter_by=categories)
     
     with col2:
         st.subheader("Category Distribution")
-        fig = px.pie(
-            category_hours, 
-            values='hours', 
-            names='classification',
-            title="Distribution of Hours by Category",
-            color_discrete_sequence=px.colors.sequential.Viridis
-        )
-        fig.update_layout(
-            legend=dict(orientation="h", y=-0.2),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={'family': 'Inter, sans-serif'},
-            margin=dict(l=20, r=20, t=60, b=20),
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(charts.category_pie, category_hours, selected, filter_by=categories)
     
     # Category trends over time
     st.subheader("Category Trends Over Time")
     
     # Category selection with Select All button
-    all_categories = sorted(filtered_df['classification'].unique())
+    all_categories = sorted(category_hours['classification'].unique())
     
     col1, col2 = st.columns([6, 1])
     with col1:
+        # The cross-filter's categories, if any, are the ones to follow
+        default_categories = list(selected) or category_hours['classification'].head(5).tolist()
         selected_categories = st.multiselect(
             "Select Categories:",
             options=all_categories,
-            default=category_hours['classification'].head(5).tolist()
+            default=default_categories
         )
     
     with col2:
@@ -346,197 +521,184 @@ with tab1:
             selected_categories = all_categories
     
     if not selected_categories:
-        selected_categories = category_hours['classification'].head(5).tolist()
+        selected_categories = default_categories
     
     # Show trends chart
-    time_category = filtered_df.groupby(['month_year', 'classification'])['hours'].sum().reset_index()
+    time_category = aggregates['time_category']
     filtered_time_category = time_category[time_category['classification'].isin(selected_categories)]
-    
-    fig = px.line(
-        filtered_time_category, 
-        x='month_year', 
-        y='hours', 
-        color='classification',
-        markers=True,
-        labels={'month_year': 'Month', 'hours': 'Hours', 'classification': 'Category'},
-        title="Category Trends Over Time"
-    )
-    fig.update_layout(
-        xaxis={'categoryorder':'array', 'categoryarray': sorted(filtered_time_category['month_year'].unique())},
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font={'family': 'Inter, sans-serif'},
-        legend=dict(orientation="h", yanchor="bottom", y=-0.3),
-        margin=dict(l=40, r=40, t=60, b=80),
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(charts.category_trends_line, filtered_time_category, time_grain)
 
-# Tab 2: Service Item Analysis
-with tab2:
-    # Service item data
-    service_hours = filtered_df.groupby('service item')['hours'].sum().reset_index()
-    service_hours = service_hours.sort_values('hours', ascending=False).head(10)
+# Service Item Analysis
+def show_service_analysis():
+    service_hours = get_view_aggregates('service')['service_hours']
     
     st.subheader("Hours by Service Item (Top 10)")
-    fig = px.bar(
-        service_hours, 
-        x='service item', 
-        y='hours',
-        color='hours',
-        labels={'service item': 'Service Item', 'hours': 'Total Hours'},
-        title="Total Hours by Service Item (Top 10)",
-        color_continuous_scale=px.colors.sequential.Plasma
-    )
-    fig.update_layout(
-        xaxis={'categoryorder':'total descending'},
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font={'family': 'Inter, sans-serif'},
-        margin=dict(l=40, r=40, t=60, b=40),
-        hoverlabel=dict(font_family="Inter, sans-serif")
+    top_services = service_hours.head(10)
+    show_chart(
+        charts.service_bar,
+        top_services,
+        selected_filter_keys('service item'),
+        filter_by=('service item', top_services['service item'].tolist())
     )
-    st.plotly_chart(fig, use_container_width=True)
     
     # Category distribution by service item
     st.subheader("Category Distribution by Service Item")
     
-    top_services = service_hours['service item'].tolist()
+    # Every service item with hours in the window, busiest first
+    services = service_hours['service item'].tolist()
     selected_service = st.selectbox(
         "Select Service Item:",
-        options=top_services,
+        options=services,
         index=0
     )
     
-    service_filtered_df = filtered_df[filtered_df['service item'] == selected_service]
-    category_dist = service_filtered_df.groupby('classification')['hours'].sum().reset_index()
-    category_dist = category_dist.sort_values('hours', ascending=False)
+    if selected_service is not None:
+        category_dist = get_view_aggregates('service', 'service item').distribution(selected_service)
+        show_chart(
+            charts.distribution_pie,
+            category_dist,
+            f"Category Distribution for {selected_service}",
+            px.colors.sequential.Plasma
+        )
+
+# Time Trends
+def show_time_trends():
+    aggregates = get_view_aggregates('trends')
     
-    fig = px.pie(
-        category_dist, 
-        values='hours', 
-        names='classification',
-        title=f"Category Distribution for {selected_service}",
-        color_discrete_sequence=px.colors.sequential.Plasma
-    )
-    fig.update_layout(
-        legend=dict(orientation="h", y=-0.2),
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font={'family': 'Inter, sans-serif'},
-        margin=dict(l=20, r=20, t=60, b=20),
-        hoverlabel=dict(font_family="Inter, sans-serif")
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-# Tab 3: Time Trends
-with tab3:
-    # Monthly trend
-    monthly_hours = filtered_df.groupby('month_year')['hours'].sum().reset_index()
-    
-    st.subheader("Monthly Hours Trend")
-    fig = px.line(
-        monthly_hours, 
-        x='month_year', 
-        y='hours',
-        markers=True,
-        labels={'month_year': 'Month', 'hours': 'Total Hours'},
-        title="Total Hours by Month"
-    )
-    fig.update_layout(
-        xaxis={'categoryorder':'array', 'categoryarray': sorted(monthly_hours['month_year'].unique())},
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font={'family': 'Inter, sans-serif'},
-        margin=dict(l=40, r=40, t=60, b=40),
-        hoverlabel=dict(font_family="Inter, sans-serif")
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    st.subheader(f"Hours Trend by {GRAINS[time_grain]}")
+    show_chart(charts.period_trend_line, aggregates['period_hours'], time_grain)
     
     # Heatmap
-    st.subheader("Monthly Hours by Category Heatmap")
-    time_category = filtered_df.groupby(['month_year', 'classification'])['hours'].sum().reset_index()
-    
-    fig = px.density_heatmap(
-        time_category,
-        x='month_year',
-        y='classification',
-        z='hours',
-        labels={'month_year': 'Month', 'classification': 'Category', 'hours': 'Hours'},
-        title="Hours by Category and Month",
-        color_continuous_scale=px.colors.sequential.Viridis
-    )
-    fig.update_layout(
-        xaxis={'categoryorder':'array', 'categoryarray': sorted(time_category['month_year'].unique())},
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font={'family': 'Inter, sans-serif'},
-        margin=dict(l=60, r=40, t=60, b=40),
-        hoverlabel=dict(font_family="Inter, sans-serif")
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    st.subheader(f"Hours by Category and {GRAINS[time_grain]} Heatmap")
+    show_chart(charts.period_heatmap, aggregates['time_category'], time_grain)
 
-# Tab 4: User Analysis
-with tab4:
-    # User hours
-    user_hours = filtered_df.groupby(['fname', 'lname'])['hours'].sum().reset_index()
-    user_hours['full_name'] = user_hours['fname'] + ' ' + user_hours['lname']
-    user_hours = user_hours.sort_values('hours', ascending=False)
+# User Analysis
+def show_user_analysis():
+    user_hours = get_view_aggregates('users')['user_hours']
     
     st.subheader("Hours by User")
-    fig = px.bar(
-        user_hours.head(10), 
-        x='full_name', 
-        y='hours',
-        color='hours',
-        labels={'full_name': 'Employee', 'hours': 'Total Hours'},
-        title="Total Hours by Employee (Top 10)",
-        color_continuous_scale=px.colors.sequential.Turbo
-    )
-    fig.update_layout(
-        xaxis={'categoryorder':'total descending'},
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font={'family': 'Inter, sans-serif'},
-        margin=dict(l=40, r=40, t=60, b=40),
-        hoverlabel=dict(font_family="Inter, sans-serif")
+    top_users = user_hours.head(10)
+    show_chart(
+        charts.user_bar,
+        top_users,
+        selected_filter_keys('employee_id'),
+        filter_by=('employee_id', top_users['employee_id'].tolist())
     )
-    st.plotly_chart(fig, use_container_width=True)
     
     # Category distribution by user
     st.subheader("Category Distribution by User")
     
-    top_users = user_hours['full_name'].head(10).tolist()
+    # Employees are selected by id, so names with spaces resolve correctly;
+    # every employee with hours in the window is offered, busiest first
+    users = user_hours['employee_id'].tolist()
     selected_user = st.selectbox(
         "Select Employee:",
-        options=top_users,
-        index=0 if len(top_users) > 0 else 0
+        options=users,
+        format_func=lambda x: data.employees.at[x, 'name'],
+        index=0 if len(users) > 0 else 0
     )
     
-    if selected_user:
-        fname, lname = selected_user.split(' ', 1)
-        user_filtered_df = filtered_df[(filtered_df['fname'] == fname) & (filtered_df['lname'] == lname)]
-        category_dist = user_filtered_df.groupby('classification')['hours'].sum().reset_index()
-        category_dist = category_dist.sort_values('hours', ascending=False)
-        
-        fig = px.pie(
-            category_dist, 
-            values='hours', 
-            names='classification',
-            title=f"Category Distribution for {selected_user}",
-            color_discrete_sequence=px.colors.sequential.Turbo
+    if selected_user is not None:
+        category_dist = get_view_aggregates('users', 'employee_id').distribution(selected_user)
+        show_chart(
+            charts.distribution_pie,
+            category_dist,
+            f"Category Distribution for {data.employees.at[selected_user, 'name']}",
+            px.colors.sequential.Turbo
+        )
+
+# Period Comparison: the selected window against the one just before it
+def show_period_comparison():
+    windows = comparison_bounds(date_range, start_date, end_date)
+    if windows is None:
+        st.info("Select a date range to compare it with the previous period of the same length.")
+        return
+    current, previous = windows
+    
+    with profile.stage('aggregate.compare'):
+        this_period, previous_period = queries.summary(current, filters), queries.summary(previous, filters)
+    last_day = timedelta(days=1)
+    st.subheader(
+        f"{current[0]:%b %d, %Y} – {current[1] - last_day:%b %d, %Y} vs "
+        f"{previous[0]:%b %d, %Y} – {previous[1] - last_day:%b %d, %Y}"
+    )
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric(
+            "Total Hours",
+            f"{this_period['hours']:.1f}",
+            f"{this_period['hours'] - previous_period['hours']:+.1f}"
         )
-        fig.update_layout(
-            legend=dict(orientation="h", y=-0.2),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={'family': 'Inter, sans-serif'},
-            margin=dict(l=20, r=20, t=60, b=20),
-            hoverlabel=dict(font_family="Inter, sans-serif")
+    with col2:
+        st.metric("Total Entries", this_period['entries'], this_period['entries'] - previous_period['entries'])
+    
+    dimension = st.selectbox(
+        "Compare By:",
+        options=list(DIMENSION_LABELS.keys()),
+        format_func=lambda x: DIMENSION_LABELS[x]
+    )
+    with profile.stage('aggregate.compare.' + dimension) as stage:
+        comparison = queries.comparison(dimension, current, previous, filters)
+        stage['rows_out'] = len(comparison)
+    column = dimension
+    if dimension == 'employee_id':
+        comparison = comparison.assign(employee=data.employees['name'].reindex(comparison['employee_id']).to_numpy())
+        column = 'employee'
+    
+    show_chart(charts.comparison_bar, comparison.head(15), column, DIMENSION_LABELS[dimension])
+    table = comparison[[column, 'hours', 'hours_previous', 'change']].rename(columns={
+        column: DIMENSION_LABELS[dimension],
+        'hours': 'This Period',
+        'hours_previous': 'Previous Period',
+        'change': 'Change',
+    })
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+# Data Explorer
+def frame_selection(search_query, filters, sort_by):
+    """Matching row count, page getter and export chunks of the in-memory rows."""
+    # Apply search and filters as row positions into the date-filtered frame
+    positions = None
+    with profile.stage('explorer.search', len(df)) as stage:
+        search_rows = data.text_index.search(data.text, search_query)
+        if search_rows is not None:
+            positions = explorer.search_positions(filtered_df, search_rows)
+            stage['rows_out'] = len(positions)
+    
+    with profile.stage('explorer.filter', len(filtered_df)) as stage:
+        positions = explorer.matching_positions(filtered_df, filters, positions)
+        record_count = len(filtered_df) if positions is None else len(positions)
+        stage['rows_out'] = record_count
+    
+    # Only the rows of the requested page are sorted into place and gathered
+    def get_page(page_index, page_size):
+        page_rows = explorer.page_positions(filtered_df, positions, sort_by, page_index, page_size)
+        return explorer.page_frame(filtered_df, data.text, page_rows, data.employees)
+    
+    return record_count, get_page, lambda: explorer.export_chunks(filtered_df, data.text, positions, sort_by, data.employees)
+
+def scanned_selection(search_query, filters, sort_by):
+    """Matching row count, page getter and export chunks of a streaming dataset."""
+    dataset = refresher.dataset
+    
+    def matches():
+        return explorer.scan_matches(dataset.chunks(), bounds, filters, search_query)
+    
+    # Each scan reads the whole file, so counts and pages are shared across sessions
+    scan_key = (data.version, bounds, filters, search_query)
+    with profile.stage('explorer.scan', len(rollup_df)) as stage:
+        record_count = aggregate_cache.get_or_compute(('scan_count',) + scan_key, lambda: explorer.scan_count(matches()))
+        stage['rows_out'] = record_count
+    
+    def get_page(page_index, page_size):
+        return aggregate_cache.get_or_compute(
+            ('scan_page', sort_by, page_index, page_size) + scan_key,
+            lambda: explorer.scan_page(matches(), sort_by, page_index, page_size),
         )
-        st.plotly_chart(fig, use_container_width=True)
+    
+    return record_count, get_page, lambda: explorer.scan_export_chunks(matches())
 
-# Tab 5: Data Explorer
-with tab5:
+def show_data_explorer():
     st.subheader("Filter and Explore Time Entries")
     
     # Create a card-like container for filters with adaptive styling
@@ -546,66 +708,116 @@ with tab5:
     
     st.markdown(filter_container_style, unsafe_allow_html=True)
     
-    # Filters
-    col1, col2, col3 = st.columns(3)
+    col1, col2 = st.columns([2, 1])
     
+    # Full-text search over notes and classification reasons
     with col1:
-        filter_category = st.selectbox(
-            "Category:",
-            options=['All'] + sorted(filtered_df['classification'].unique().tolist()),
-            index=0
+        search_query = st.text_input(
+            "Search notes and reasons:",
+            placeholder='All words must match, quote exact phrases: acme "ticket 42"'
         )
     
+    # Categories, service items and employees are filtered in the sidebar
     with col2:
-        filter_service = st.selectbox(
-            "Service Item:",
-            options=['All'] + sorted(filtered_df['service item'].unique().tolist()[:20]),
-            index=0
-        )
-    
-    with col3:
-        sort_options = {
-            'date_desc': 'Date (Newest First)',
-            'date_asc': 'Date (Oldest First)',
-            'hours_desc': 'Hours (Highest First)',
-            'hours_asc': 'Hours (Lowest First)'
-        }
         sort_by = st.selectbox(
             "Sort By:",
-            options=list(sort_options.keys()),
-            format_func=lambda x: sort_options[x],
+            options=list(explorer.SORT_OPTIONS.keys()),
+            format_func=lambda x: explorer.SORT_OPTIONS[x],
             index=0
         )
     
     st.markdown("</div>", unsafe_allow_html=True)
     
-    # Apply filters
-    table_df = filtered_df.copy()
-    table_df['employee'] = table_df['fname'] + ' ' + table_df['lname']
-    
-    if filter_category != 'All':
-        table_df = table_df[table_df['classification'] == filter_category]
-    
-    if filter_service != 'All':
-        table_df = table_df[table_df['service item'] == filter_service]
-    
-    # Apply sorting
-    if sort_by == 'date_desc':
-        table_df = table_df.sort_values('date', ascending=False)
-    elif sort_by == 'date_asc':
-        table_df = table_df.sort_values('date', ascending=True)
-    elif sort_by == 'hours_desc':
-        table_df = table_df.sort_values('hours', ascending=False)
-    elif sort_by == 'hours_asc':
-        table_df = table_df.sort_values('hours', ascending=True)
+    if filtered_df is None:
+        record_count, get_page, export_chunks = scanned_selection(search_query, filters, sort_by)
+    else:
+        record_count, get_page, export_chunks = frame_selection(search_query, filters, sort_by)
     
-    # Display table with record count info
-    record_count = len(table_df)
-    st.markdown(f"<p style='margin-bottom: 10px;'>Showing {min(record_count, 1000)} of {record_count} records</p>", unsafe_allow_html=True)
+    # Pagination controls
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        page_size = st.selectbox("Rows per page:", options=[50, 100, 250, 500, 1000], index=1)
+    page_count = max(1, -(-record_count // page_size))
+    with col2:
+        page_number = st.number_input("Page:", min_value=1, max_value=page_count, value=1, step=1)
+    page_index = min(int(page_number), page_count) - 1
+    
+    with profile.stage('explorer.page', record_count) as stage:
+        page = get_page(page_index, page_size)
+        stage['rows_out'] = len(page)
+    last_row = page_index * page_size + len(page)
+    first_row = min(page_index * page_size + 1, last_row)
+    st.markdown(
+        f"<p style='margin-bottom: 10px;'>Showing {first_row}-{last_row} of {record_count} records "
+        f"(page {page_index + 1} of {page_count})</p>",
+        unsafe_allow_html=True
+    )
     
     # Display table
-    display_cols = ['local_date', 'employee', 'hours', 'service item', 'notes', 'classification', 'classification_reason']
-    st.dataframe(table_df[display_cols].head(1000), use_container_width=True)
+    with profile.stage('render.dataframe', len(page)):
+        st.dataframe(page, use_container_width=True)
+    
+    # Downloads of the whole selection, not just this page. The files are
+    # only written when a button is clicked, encoded chunk by chunk into
+    # memory: the peak is the encoded file, not a second copy of the table.
+    def export(write):
+        def build():
+            buffer = io.BytesIO()
+            write(export_chunks(), buffer)
+            return buffer.getvalue()
+        return build
+    
+    file_stem = f"time_entries_{start_date or 'start'}_{end_date or 'end'}"
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.download_button(
+            f"Download CSV ({record_count} rows)", export(explorer.write_csv),
+            file_name=f"{file_stem}.csv", mime="text/csv", on_click="ignore"
+        )
+    with col2:
+        st.download_button(
+            f"Download Parquet ({record_count} rows)", export(explorer.write_parquet),
+            file_name=f"{file_stem}.parquet", mime="application/vnd.apache.parquet", on_click="ignore"
+        )
+
+if active_view == 'category':
+    show_category_analysis()
+elif active_view == 'service':
+    show_service_analysis()
+elif active_view == 'trends':
+    show_time_trends()
+elif active_view == 'users':
+    show_user_analysis()
+elif active_view == 'compare':
+    show_period_comparison()
+else:
+    show_data_explorer()
+
+# Version of the data this rerun was served from
+st.sidebar.caption(
+    f"Data version {data.version}, loaded {data.loaded_at:%Y-%m-%d %H:%M:%S} in {data.load_seconds:.1f}s"
+)
+if refresher.last_error is not None:
+    st.sidebar.caption(f"Last refresh failed: {refresher.last_error}")
+
+# Shared aggregate cache statistics
+for cache_name, cache in [("Aggregate", aggregate_cache), ("Figure", figure_cache)]:
+    cache_stats = cache.stats()
+    st.sidebar.caption(
+        f"{cache_name} cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+        f"{cache_stats['bytes'] / 2**20:.1f} of {cache_stats['max_bytes'] / 2**20:.0f} MB"
+    )
+
+# Stage timings of this rerun
+if PROFILING:
+    if PROFILING_LOG:
+        profile.write(PROFILING_LOG)
+    with st.sidebar.expander("Profiling"):
+        st.caption(f"Rerun {profile.rerun_id}: {profile.total_seconds() * 1000:.0f} ms")
+        stages = pd.DataFrame(profile.stages)
+        stages['ms'] = stages.pop('seconds') * 1000
+        stages['rss_delta_mb'] = pd.to_numeric(stages.pop('rss_delta_bytes')) / 2**20
+        st.dataframe(stages.drop(columns='view'), hide_index=True, use_container_width=True)
 
 # Add footer with adaptive styling
 st.markdown("---")
@@ -0,0 +1,303 @@
+"""Concurrent-session load test of the dashboard.
+
+Simulates N authenticated sessions clicking through app.py at once, inside
+one process as a single Streamlit server would run them, using Streamlit's
+AppTest driver. Every session logs in, then repeatedly switches the date
+preset, the view, the selected service item or the selected employee, or
+toggles a category in the sidebar cross-filter, each action being one script
+rerun. Reruns of different sessions run on their own threads at the same
+time, sharing the app's process-wide caches. Rerun latencies are pooled
+across sessions and reported as p50/p95/p99 along with throughput and the
+growth of process RSS per session. Pass several session counts to see how
+one server process scales; results are written as JSON next to the benchmark
+results.
+
+Usage:
+    python benchmarks/load_test.py --rows 100k --sessions 1,4,8 --actions 20
+    python benchmarks/load_test.py --csv classified_timesheet.csv --sessions 16 --backend sqlite
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import streamlit as st  # noqa: E402
+from streamlit.components.v2.component_manager import BidiComponentManager  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager  # noqa: E402
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.runtime.pages_manager import PagesManager  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.runtime.secrets import Secrets  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner  # noqa: E402
+from streamlit.testing.v1.util import patch_config_options  # noqa: E402
+
+from profiling import current_rss, percentile  # noqa: E402
+from synthetic_timesheet import parse_rows, write_timesheet  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, 'app.py')
+
+# The app's fallback password, used when no [auth] secret is configured
+PASSWORD = 'timecategorization'
+
+PRESETS = ['all', '3d', '1w', '1m', '3m']
+VIEWS = ['category', 'service', 'trends', 'users', 'compare', 'explorer']
+ACTIONS = ['preset', 'view', 'service', 'user', 'filter']
+
+
+# Runtime pieces shared by every session's reruns, see shared_runtime
+_shared = {}
+
+
+@contextmanager
+def shared_runtime(secrets):
+    """Install one mock runtime, secrets and script cache for all sessions.
+
+    AppTest.run sets these process-wide objects up around every run and
+    tears them down afterwards, so runs on several threads would clobber each
+    other's. Installed once here, sessions only drive their own script runner.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    components = BidiComponentManager()
+    components.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = components
+    saved_secrets = st.secrets
+    st.secrets = Secrets()
+    st.secrets._secrets = secrets
+    Runtime._instance = runtime
+    PagesManager.uses_pages_directory = None
+    # One script cache compiles the app once instead of once per rerun,
+    # which also keeps compiles off concurrent threads
+    _shared['script_cache'] = ScriptCache()
+    _shared['pages_manager'] = PagesManager(APP_PATH, _shared['script_cache'], setup_watcher=False)
+    try:
+        with patch_config_options({'global.appTest': True}):
+            yield
+    finally:
+        Runtime._instance = None
+        st.secrets = saved_secrets
+        _shared.clear()
+
+
+class ConcurrentAppTest(AppTest):
+    """AppTest whose reruns may run on several threads at once, inside shared_runtime."""
+
+    def _run(self, widget_state=None, timeout=None):
+        runner = LocalScriptRunner(
+            self._script_path,
+            self._session_state,
+            _shared['pages_manager'],
+            args=self.args,
+            kwargs=self.kwargs,
+            fragment_storage=self._fragment_storage,
+        )
+        runner._script_cache = _shared['script_cache']
+        self._tree = runner.run(widget_state, self.query_params, timeout or self.default_timeout, self._page_hash)
+        self._tree._runner = self
+        return self
+
+
+def _widget(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    return None
+
+
+class Session:
+    """One simulated user; every action is a timed rerun of the script."""
+
+    def __init__(self, seed, timeout):
+        self.app = ConcurrentAppTest(APP_PATH, default_timeout=timeout)
+        self.random = random.Random(seed)
+        self.timings = []
+        self.errors = 0
+
+    def _run(self, action, widget=None):
+        started = time.perf_counter()
+        (widget or self.app).run()
+        self.timings.append((action, time.perf_counter() - started))
+        if self.app.exception:
+            self.errors += 1
+
+    def open(self):
+        self.app.run()
+
+    def login(self):
+        self.app.text_input(key='password_input').input(PASSWORD)
+        self._run('login', self.app.button[0].click())
+
+    def _select_view(self, view):
+        self._run('view', self.app.radio(key='active_view').set_value(view))
+
+    def _pick(self, view, label, action):
+        if self.app.radio(key='active_view').value != view:
+            self._select_view(view)
+        selectbox = _widget(self.app.main.selectbox, label)
+        if selectbox is not None and selectbox.options:
+            self._run(action, selectbox.select_index(self.random.randrange(len(selectbox.options))))
+
+    def _toggle_category(self):
+        multiselect = self.app.sidebar.multiselect(key='filter_classification')
+        category = self.random.choice(multiselect.options)
+        if category in multiselect.value:
+            self._run('filter', multiselect.unselect(category))
+        else:
+            self._run('filter', multiselect.select(category))
+
+    def act(self):
+        action = self.random.choice(ACTIONS)
+        if action == 'preset':
+            self._run(action, _widget(self.app.sidebar.selectbox, 'Date Range').select(self.random.choice(PRESETS)))
+        elif action == 'view':
+            self._select_view(self.random.choice(VIEWS))
+        elif action == 'service':
+            self._pick('service', 'Select Service Item:', action)
+        elif action == 'filter':
+            self._toggle_category()
+        else:
+            self._pick('users', 'Select Employee:', action)
+
+
+def run_level(sessions, actions, seed, timeout):
+    """Run `sessions` concurrent sessions of `actions` actions each after logging in."""
+    users = [Session(seed + i, timeout) for i in range(sessions)]
+    for session in users:
+        session.open()
+    rss_before = current_rss()
+    start = threading.Barrier(sessions + 1)
+
+    def drive(session):
+        start.wait()
+        try:
+            session.login()
+            for _ in range(actions):
+                session.act()
+        except Exception as error:
+            # A session whose page no longer has the expected widgets stops
+            session.errors += 1
+            print(f"  session stopped: {error!r}")
+
+    threads = [threading.Thread(target=drive, args=(session,)) for session in users]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    rss_after = current_rss()
+
+    timings = [seconds for session in users for _, seconds in session.timings]
+    by_action = defaultdict(list)
+    for session in users:
+        for action, seconds in session.timings:
+            by_action[action].append(seconds)
+    rss_growth = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+    return {
+        'sessions': sessions,
+        'reruns': len(timings),
+        'errors': sum(session.errors for session in users),
+        'seconds': elapsed,
+        'reruns_per_second': len(timings) / elapsed if elapsed else None,
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'max': max(timings),
+        'rss_bytes': rss_after,
+        'rss_per_session_bytes': rss_growth / sessions if rss_growth is not None else None,
+        'actions': {
+            action: {'count': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+            for action, values in sorted(by_action.items())
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100k', help="synthetic timesheet size, e.g. 100k or 1m")
+    parser.add_argument('--csv', help="load test against an existing timesheet export instead")
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmark-data'))
+    parser.add_argument('--sessions', default='1,4,8', help="comma-separated concurrent session counts")
+    parser.add_argument('--actions', type=int, default=20, help="actions per session after logging in")
+    parser.add_argument('--backend', choices=['pandas', 'sqlite'], default='pandas', help="query backend")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300, help="seconds allowed for a single rerun")
+    parser.add_argument('--output', help="result file (default: benchmark-results/load-<timestamp>.json)")
+    args = parser.parse_args()
+
+    csv_path = args.csv
+    if not csv_path:
+        csv_path = os.path.join(args.data_dir, f'timesheet_{args.rows}.csv')
+        if not os.path.exists(csv_path):
+            print(f"Generating {args.rows} rows into {csv_path}")
+            write_timesheet(csv_path, parse_rows(args.rows))
+    # Profiling stays off so its log writes don't add to the latencies
+    secrets = {'data': {'path': os.path.abspath(csv_path), 'backend': args.backend}, 'profiling': {'enabled': False}}
+
+    levels = []
+    with shared_runtime(secrets):
+        # The first session loads the dataset into the process-wide caches,
+        # which is timed on its own rather than counted as rerun latency
+        print(f"Warming up on {os.path.basename(csv_path)}")
+        warmup = Session(args.seed, args.timeout)
+        warmup.open()
+        started = time.perf_counter()
+        warmup.login()
+        warmup_seconds = time.perf_counter() - started
+        print(f"  first login {warmup_seconds * 1000:.0f} ms")
+
+        print(f"{'sessions':>8} {'reruns':>7} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'reruns/s':>9} {'MiB/session':>12}")
+        for sessions in [int(value) for value in args.sessions.split(',')]:
+            level = run_level(sessions, args.actions, args.seed + 1000 * sessions, args.timeout)
+            levels.append(level)
+            per_session = level['rss_per_session_bytes']
+            print(
+                f"{sessions:>8} {level['reruns']:>7} {level['errors']:>6} {level['p50'] * 1000:>9.1f} "
+                f"{level['p95'] * 1000:>9.1f} {level['p99'] * 1000:>9.1f} {level['reruns_per_second']:>9.2f} "
+                f"{per_session / 2**20 if per_session is not None else float('nan'):>12.1f}"
+            )
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'dataset': os.path.basename(csv_path),
+            'backend': args.backend,
+            'actions_per_session': args.actions,
+            'warmup_seconds': warmup_seconds,
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+        },
+        'levels': levels,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmark-results', 'load-' + datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nPeak RSS {report['meta']['peak_rss_bytes'] / 2**20:.0f} MiB, results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
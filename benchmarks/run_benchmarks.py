@@ -0,0 +1,255 @@
+"""Headless benchmarks for the dashboard's data path.
+
+Times loading, date filtering, each view's aggregations and figure
+construction outside the Streamlit runtime, on synthetic timesheets of the
+requested sizes or on an existing export. Each stage is run once under
+tracemalloc to record its peak allocation, then timed without it. Results
+are written as JSON; pass --compare with an earlier result file to print
+per-stage changes. --backend sqlite runs the aggregations through the
+SQLite query backend instead of pandas.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 100k,1m
+    python benchmarks/run_benchmarks.py --rows 1m --backend sqlite
+    python benchmarks/run_benchmarks.py --csv classified_timesheet.csv --compare benchmark-results/old.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import plotly  # noqa: E402
+import plotly.express as px  # noqa: E402
+
+import charts  # noqa: E402
+import data_loader  # noqa: E402
+import explorer  # noqa: E402
+from dataset import TimesheetDataset  # noqa: E402
+import date_filters  # noqa: E402
+from date_filters import filter_dataframe, get_start_date  # noqa: E402
+from query_backends import PandasQueries, SqliteStore  # noqa: E402
+from synthetic_timesheet import parse_rows, write_timesheet  # noqa: E402
+
+PRESETS = ['all', '3m', '1m', '1w']
+VIEWS = ['category', 'service', 'trends', 'users']
+SEARCH_QUERIES = ['reconciled', 'bank feeds client', '"balance sheet accounts"']
+
+
+def build_view_figures(view, aggregates, queries, bounds, employees):
+    # Mirrors the figures each view renders in app.py
+    if view == 'category':
+        category_hours = aggregates['category_hours']
+        top = category_hours['classification'].head(5).tolist()
+        time_category = aggregates['time_category']
+        return [
+            charts.category_bar(category_hours),
+            charts.category_pie(category_hours),
+            charts.category_trends_line(time_category[time_category['classification'].isin(top)], 'month'),
+        ]
+    if view == 'service':
+        service_hours = aggregates['service_hours'].head(10)
+        figures = [charts.service_bar(service_hours)]
+        if len(service_hours):
+            selected = service_hours['service item'].iloc[0]
+            dist = queries.category_breakdown('service item', bounds).distribution(selected)
+            figures.append(charts.distribution_pie(dist, f"Category Distribution for {selected}", px.colors.sequential.Plasma))
+        return figures
+    if view == 'trends':
+        return [
+            charts.period_trend_line(aggregates['period_hours'], 'month'),
+            charts.period_heatmap(aggregates['time_category'], 'month'),
+        ]
+    user_hours = aggregates['user_hours']
+    figures = [charts.user_bar(user_hours.head(10))]
+    if len(user_hours):
+        top = user_hours.iloc[0]
+        dist = queries.category_breakdown('employee_id', bounds).distribution(top['employee_id'])
+        figures.append(charts.distribution_pie(dist, f"Category Distribution for {employees.at[top['employee_id'], 'name']}", px.colors.sequential.Turbo))
+    return figures
+
+
+def count_rows(result):
+    if isinstance(result, dict):
+        return sum(count_rows(value) or 0 for value in result.values())
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(result)
+    if hasattr(result, 'frame'):
+        return len(result.frame)
+    return len(result) if isinstance(result, list) else None
+
+
+class Recorder:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, stage, fn, rows_in=None, repeat=None):
+        gc.collect()
+        tracemalloc.start()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        timings = []
+        for _ in range(repeat or self.repeat):
+            gc.collect()
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        record = {
+            'stage': stage,
+            'rows_in': rows_in,
+            'rows_out': count_rows(result),
+            'seconds_min': min(timings),
+            'seconds_median': statistics.median(timings),
+            'peak_alloc_bytes': peak,
+        }
+        self.results.append(record)
+        print(f"  {stage:<40} {record['seconds_median'] * 1000:10.2f} ms  {peak / 2**20:9.1f} MiB peak")
+        return result
+
+
+def remove_snapshot(csv_path):
+    for path in data_loader.snapshot_paths(csv_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def date_bounds(preset, frame):
+    if preset == 'all':
+        first, _ = data_loader.date_extent(frame)
+        return (first.date() if not pd.isna(first) else None), datetime.now().date()
+    return get_start_date(preset), datetime.now().date()
+
+
+def benchmark_csv(csv_path, recorder, repeat, backend='pandas'):
+    label = os.path.basename(csv_path)
+    print(f"{label}:")
+
+    def cold_load():
+        remove_snapshot(csv_path)
+        return data_loader.load_timesheet(csv_path)
+
+    frame = recorder.measure('load.csv_parse', cold_load, repeat=max(1, repeat // 2))
+    rows = len(frame)
+    recorder.measure('load.snapshot', lambda: data_loader.load_timesheet(csv_path), rows)
+    data = recorder.measure('load.dataset', lambda: TimesheetDataset(csv_path).current, rows, repeat=max(1, repeat // 2))
+    frame, rollup_df = data.frame, data.rollup
+    if backend == 'sqlite':
+        queries = recorder.measure('backend.sqlite.build', lambda: SqliteStore().queries(data), len(rollup_df), repeat=1)
+    else:
+        queries = PandasQueries(data)
+
+    for preset in PRESETS:
+        start, end = date_bounds(preset, rollup_df)
+        filtered_df = recorder.measure(f'filter.frame.{preset}', lambda: filter_dataframe(frame, preset, start, end), rows)
+        filtered_rollup = recorder.measure(f'filter.rollup.{preset}', lambda: filter_dataframe(rollup_df, preset, start, end), len(rollup_df))
+        bounds = date_filters.date_bounds(preset, start, end)
+        for view in VIEWS:
+            aggregates = recorder.measure(
+                f'aggregate.{view}.{preset}', lambda: queries.view_aggregates(view, bounds), len(filtered_rollup)
+            )
+            recorder.measure(
+                f'figures.{view}.{preset}', lambda: build_view_figures(view, aggregates, queries, bounds, data.employees), len(filtered_rollup)
+            )
+        # Cross-filtered by the window's busiest category and its three busiest employees
+        top = queries.view_aggregates('category', bounds)['category_hours']['classification']
+        top_users = queries.view_aggregates('users', bounds)['user_hours']['employee_id']
+        filters = (('classification', tuple(top.head(1).tolist())), ('employee_id', tuple(top_users.head(3).tolist())))
+        for view in VIEWS:
+            recorder.measure(
+                f'aggregate.{view}.{preset}.filtered', lambda: queries.view_aggregates(view, bounds, 'month', filters), len(filtered_rollup)
+            )
+        for sort_by in explorer.SORT_OPTIONS:
+            recorder.measure(
+                f'explorer.{sort_by}.{preset}',
+                lambda: explorer.page_frame(filtered_df, data.text, explorer.page_positions(filtered_df, None, sort_by, 10, 100), data.employees),
+                len(filtered_df),
+            )
+
+    for query in SEARCH_QUERIES:
+        recorder.measure(f'search.{query}', lambda: data.text_index.search(data.text, query), rows)
+    return rows
+
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = {(r['dataset'], r['stage']): r for r in json.load(f)['results']}
+    print(f"\nChange vs {previous_path} (median time):")
+    for record in results:
+        before = previous.get((record['dataset'], record['stage']))
+        if before and before['seconds_median'] > 0:
+            change = record['seconds_median'] / before['seconds_median'] - 1
+            flag = '  REGRESSION' if change > 0.2 else ''
+            print(f"  {record['dataset']:<28} {record['stage']:<40} {change:+8.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100k', help="comma-separated synthetic sizes, e.g. 100k,1m,10m")
+    parser.add_argument('--csv', help="benchmark an existing timesheet export instead of synthetic data")
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmark-data'))
+    parser.add_argument('--output', help="result file (default: benchmark-results/<timestamp>.json)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--compare', help="earlier result file to compare against")
+    parser.add_argument('--backend', choices=['pandas', 'sqlite'], default='pandas', help="query backend for the aggregations")
+    args = parser.parse_args()
+
+    if args.csv:
+        csv_paths = [args.csv]
+    else:
+        csv_paths = []
+        for size in args.rows.split(','):
+            path = os.path.join(args.data_dir, f'timesheet_{size}.csv')
+            if not os.path.exists(path):
+                print(f"Generating {size} rows into {path}")
+                write_timesheet(path, parse_rows(size))
+            csv_paths.append(path)
+
+    recorder = Recorder(args.repeat)
+    results = []
+    for csv_path in csv_paths:
+        recorder.results = []
+        rows = benchmark_csv(csv_path, recorder, args.repeat, args.backend)
+        for record in recorder.results:
+            results.append(dict(record, dataset=os.path.basename(csv_path), dataset_rows=rows))
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plotly': plotly.__version__,
+            'repeat': args.repeat,
+            'backend': args.backend,
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmark-results', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nPeak RSS {report['meta']['peak_rss_bytes'] / 2**20:.0f} MiB, results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
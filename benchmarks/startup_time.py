@@ -0,0 +1,102 @@
+"""Time to first chart of a freshly started server process.
+
+Each sample runs in a new Python process, as after a deploy or restart, and
+drives app.py through Streamlit's AppTest the way a user would: the login
+page is rendered, the user spends --think seconds typing the password, and
+the rerun triggered by Login ends with the first view's charts. Reports the
+median time to render the login page, from clicking Login to the first
+chart, and from opening the page to the first chart. Point --app at another
+copy of the app, such as the revision before the analytics imports were
+deferred past the login, to compare before and after.
+
+Usage:
+    python benchmarks/startup_time.py --rows 100k --samples 5
+    git show <revision>:app.py > /tmp/app_before.py
+    python benchmarks/startup_time.py --rows 100k --app /tmp/app_before.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_timesheet import parse_rows, write_timesheet  # noqa: E402
+
+# The app's fallback password, used when no [auth] secret is configured
+PASSWORD = 'timecategorization'
+
+STAGES = ['login_page', 'login_to_chart', 'open_to_chart']
+
+
+def measure(app_path, csv_path, think, timeout):
+    """One cold start, in the current process; Streamlit itself is already imported."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(app_path, default_timeout=timeout)
+    app.secrets['data'] = {'path': csv_path}
+    opened = time.perf_counter()
+    app.run()
+    login_page = time.perf_counter() - opened
+    time.sleep(think)
+    app.text_input(key='password_input').input(PASSWORD)
+    clicked = time.perf_counter()
+    app.button[0].click().run()
+    charted = time.perf_counter()
+    if app.exception or not len(app.get('plotly_chart')):
+        raise RuntimeError(f"no chart after login: {app.exception}")
+    return {
+        'login_page': login_page,
+        'login_to_chart': charted - clicked,
+        'open_to_chart': charted - opened - think,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100k', help="synthetic timesheet size, e.g. 100k or 1m")
+    parser.add_argument('--csv', help="time against an existing timesheet export instead")
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmark-data'))
+    parser.add_argument('--app', default=os.path.join(ROOT, 'app.py'), help="app script to start")
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--think', type=float, default=2.0, help="seconds spent typing the password")
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.app, args.csv, args.think, args.timeout)))
+        return
+
+    csv_path = args.csv
+    if not csv_path:
+        csv_path = os.path.join(args.data_dir, f'timesheet_{args.rows}.csv')
+        if not os.path.exists(csv_path):
+            print(f"Generating {args.rows} rows into {csv_path}")
+            write_timesheet(csv_path, parse_rows(args.rows))
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', '--app', os.path.abspath(args.app),
+        '--csv', os.path.abspath(csv_path), '--think', str(args.think), '--timeout', str(args.timeout),
+    ]
+
+    samples = []
+    for i in range(args.samples):
+        # Run from the repo so the app's modules import as they would when served
+        result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=ROOT))
+        if result.returncode != 0:
+            sys.exit(f"sample {i + 1} failed:\n{result.stderr}")
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        print(f"  sample {i + 1}: " + ', '.join(f"{stage} {samples[-1][stage] * 1000:.0f} ms" for stage in STAGES))
+
+    print(f"\n{os.path.basename(args.app)} on {os.path.basename(csv_path)}, median of {len(samples)}:")
+    for stage in STAGES:
+        print(f"  {stage:<16} {statistics.median(sample[stage] for sample in samples) * 1000:8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
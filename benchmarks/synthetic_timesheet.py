@@ -0,0 +1,136 @@
+"""Generate synthetic data shaped like classified_timesheet.csv.
+
+Cardinalities follow a mid-sized firm: a few hundred employees (some with
+multi-word first names), about a thousand service items of which each
+employee works on a small portfolio, a couple of dozen
+classifications with skewed frequencies, and long free-text notes. Rows are
+written in chunks, so 10M-row files can be generated with bounded memory.
+
+Usage:
+    python benchmarks/synthetic_timesheet.py --rows 1m --output data/classified_timesheet.csv
+"""
+import argparse
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+CHUNK_ROWS = 500_000
+
+# Service items each employee works on
+PORTFOLIO_SIZE = 25
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Carlos', 'Ana',
+    'Wei', 'Priya', 'Mohammed', 'Fatima', 'Mary Ann', 'Jo Ellen', 'Juan Carlos', 'Anne Marie',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Nguyen', 'Patel', 'Chen', 'Van der Berg', 'De la Cruz',
+]
+CLASSIFICATIONS = [
+    'Bookkeeping', 'Payroll', 'Tax Preparation', 'Tax Planning', 'Advisory', 'Audit Support',
+    'Accounts Payable', 'Accounts Receivable', 'Bank Reconciliation', 'Financial Reporting',
+    'Client Communication', 'Internal Meetings', 'Training', 'Administration', 'Onboarding',
+    'Sales Tax', 'Budgeting', 'Forecasting', 'Cleanup', 'Software Setup', 'Quality Review', 'Other',
+]
+SERVICE_PREFIXES = ['Monthly', 'Quarterly', 'Annual', 'Project', 'Retainer', 'Catch-up']
+SERVICE_KINDS = ['Bookkeeping', 'Payroll', 'Tax Return', 'CFO Services', 'Advisory', 'Audit Prep', 'Cleanup']
+NOTE_VERBS = ['Reviewed', 'Reconciled', 'Prepared', 'Updated', 'Discussed', 'Categorized', 'Followed up on',
+              'Researched', 'Corrected', 'Filed', 'Drafted', 'Called client about']
+NOTE_OBJECTS = ['bank feeds', 'credit card transactions', 'payroll journal', 'sales tax filing', 'AP aging',
+                'AR aging', 'month-end close checklist', 'balance sheet accounts', 'vendor 1099s',
+                'loan amortization schedule', 'fixed asset register', 'QuickBooks rules', 'budget variance',
+                'open invoices', 'prior year adjustments', 'depreciation entries']
+NOTE_DETAILS = ['per email from controller', 'ahead of the quarterly review', 'flagged in last review',
+                'requested by the owner', 'after bank statement arrived', 'for the board package',
+                'due to duplicate entries', 'with notes left in the shared drive', 'pending client reply']
+REASONS = ['Keyword match on {kind}', 'Service item maps to {kind}', 'Model prediction: {kind}',
+           'Notes mention {kind} activities', 'Rule: default category for service item']
+
+
+def make_dimensions(rng):
+    employees = pd.DataFrame({
+        'fname': rng.choice(FIRST_NAMES, 300),
+        'lname': rng.choice(LAST_NAMES, 300),
+    }).drop_duplicates(ignore_index=True)
+    services = pd.Series([
+        f"{rng.choice(SERVICE_PREFIXES)} {rng.choice(SERVICE_KINDS)} - Client {i:04d}" for i in range(1000)
+    ]).drop_duplicates().to_numpy()
+    portfolios = zipf_choice(rng, len(services), len(employees) * PORTFOLIO_SIZE).reshape(len(employees), -1)
+    notes = np.array([
+        f"{verb} {obj} {detail}. " * 2
+        for verb in NOTE_VERBS for obj in NOTE_OBJECTS for detail in NOTE_DETAILS
+    ])
+    return employees, services, portfolios, notes
+
+
+def zipf_choice(rng, size, n):
+    # Skewed popularity: a few values account for most rows
+    weights = 1.0 / np.arange(1, size + 1)
+    return rng.choice(size, n, p=weights / weights.sum())
+
+
+def generate_chunk(rng, n, dimensions, end_date, days):
+    employees, services, portfolios, notes = dimensions
+    employee = zipf_choice(rng, len(employees), n)
+    category = zipf_choice(rng, len(CLASSIFICATIONS), n)
+    dates = pd.Series(np.datetime64(end_date) - rng.integers(0, days, n).astype('timedelta64[D]'))
+    clients = pd.Series(rng.integers(0, 5000, n)).astype(str)
+    tickets = pd.Series(rng.integers(1000, 99999, n)).astype(str)
+    note_text = pd.Series(notes[rng.integers(0, len(notes), n)]) + 'Client ' + clients + ', ticket #' + tickets
+    # Every reason template formatted with every classification, indexed per row
+    reasons = np.array([reason.format(kind=kind) for reason in REASONS for kind in CLASSIFICATIONS])
+    reason = rng.integers(0, len(REASONS), n) * len(CLASSIFICATIONS) + category
+    return pd.DataFrame({
+        'local_date': dates.dt.strftime('%Y-%m-%d'),
+        'fname': employees['fname'].to_numpy()[employee],
+        'lname': employees['lname'].to_numpy()[employee],
+        'hours': rng.integers(1, 33, n) / 4,
+        'service item': services[portfolios[employee, zipf_choice(rng, PORTFOLIO_SIZE, n)]],
+        'notes': note_text,
+        'classification': np.array(CLASSIFICATIONS)[category],
+        'classification_reason': reasons[reason],
+    })
+
+
+def write_timesheet(path, rows, seed=0, years=5, end_date=None):
+    rng = np.random.default_rng(seed)
+    dimensions = make_dimensions(rng)
+    end_date = end_date or date.today()
+    days = 365 * years
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    written = 0
+    with open(path, 'w', newline='') as f:
+        while written < rows:
+            n = min(CHUNK_ROWS, rows - written)
+            chunk = generate_chunk(rng, n, dimensions, end_date, days)
+            chunk.to_csv(f, header=(written == 0), index=False)
+            written += n
+    return path
+
+
+def parse_rows(value):
+    return SIZES.get(value.lower()) or int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100k', help="row count or one of: " + ', '.join(SIZES))
+    parser.add_argument('--output', default='classified_timesheet.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--years', type=int, default=5, help="years of history ending today")
+    args = parser.parse_args()
+    write_timesheet(args.output, parse_rows(args.rows), seed=args.seed, years=args.years)
+    print(f"Wrote {parse_rows(args.rows):,} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
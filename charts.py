@@ -0,0 +1,289 @@
+"""Plotly figure builders for the dashboard views."""
+import itertools
+
+import numpy as np
+import plotly.express as px
+
+from downsampling import lttb
+from periods import GRAINS, PERIOD_COLUMNS
+
+# Transparent backgrounds and the app font, shared by every chart
+BASE_LAYOUT = dict(
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font={'family': 'Inter, sans-serif'},
+)
+HOVER_LABEL = dict(font_family="Inter, sans-serif")
+
+# Most points drawn per line series and most heatmap columns; longer day or
+# week histories are downsampled with LTTB before the figure is built
+MAX_POINTS = 500
+
+# JSON bytes of a figure without its traces, mostly its template, and of
+# each trace and each value of its data arrays, measured on the dashboard's
+# charts. The arrays are the traces' data and the marker's per-point colors
+# and opacities
+FIGURE_BYTES = 7_000
+TRACE_BYTES = 300
+VALUE_BYTES = 13
+DATA_ARRAYS = ('x', 'y', 'z', 'labels', 'values', 'parents', 'ids', 'customdata')
+MARKER_ARRAYS = ('color', 'colors', 'opacity')
+
+# Opacity of the bars and sectors left out of the cross-filter's selection
+UNSELECTED_OPACITY = 0.3
+
+
+def _array_size(value):
+    return 0 if value is None or isinstance(value, (str, int, float)) else int(np.size(value))
+
+
+def figure_size(fig):
+    """Approximate bytes of a figure's JSON spec, as sent to the browser.
+
+    Counted from the lengths of the traces' data arrays rather than by
+    serializing the figure, which st.plotly_chart does anyway.
+    """
+    values = 0
+    for trace in fig.data:
+        values += sum(_array_size(getattr(trace, name, None)) for name in DATA_ARRAYS)
+        marker = getattr(trace, 'marker', None)
+        if marker is not None:
+            values += sum(_array_size(getattr(marker, name, None)) for name in MARKER_ARRAYS)
+    return FIGURE_BYTES + TRACE_BYTES * len(fig.data) + VALUE_BYTES * values
+
+
+def _highlight_bars(fig, keys, selected):
+    """Fade the bars whose key is not among the cross-filter's `selected` keys."""
+    if selected:
+        selected = set(selected)
+        fig.update_traces(marker_opacity=[1.0 if key in selected else UNSELECTED_OPACITY for key in keys])
+    return fig
+
+
+def _faded(color):
+    red, green, blue = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return f'rgba({red},{green},{blue},{UNSELECTED_OPACITY})'
+
+
+def category_bar(category_hours, selected=()):
+    fig = px.bar(
+        category_hours,
+        x='classification',
+        y='hours',
+        color='hours',
+        labels={'classification': 'Category', 'hours': 'Total Hours'},
+        title="Total Hours by Category",
+        color_continuous_scale=px.colors.sequential.Viridis
+    )
+    fig.update_layout(
+        xaxis={'categoryorder':'total descending'},
+        margin=dict(l=40, r=40, t=60, b=40),
+        **BASE_LAYOUT
+    )
+    return _highlight_bars(fig, category_hours['classification'], selected)
+
+
+def category_pie(category_hours, selected=()):
+    # Drawn as a sunburst of a single ring, which looks like a pie but whose
+    # sectors report clicks to Streamlit, unlike pie slices
+    fig = px.sunburst(
+        category_hours,
+        path=['classification'],
+        values='hours',
+        title="Distribution of Hours by Category",
+        color_discrete_sequence=px.colors.sequential.Viridis
+    )
+    fig.update_traces(textinfo='label+percent root')
+    fig.update_layout(
+        margin=dict(l=20, r=20, t=60, b=20),
+        **BASE_LAYOUT
+    )
+    if selected:
+        # Sectors take the colorway in label order; unselected ones are faded
+        selected = set(selected)
+        fig.update_traces(marker_colors=[
+            color if label in selected else _faded(color)
+            for label, color in zip(fig.data[0].labels, itertools.cycle(fig.layout.sunburstcolorway))
+        ])
+    return fig
+
+
+def clicked_keys(points, keys):
+    """Keys of the bars or sectors in a chart's selected points.
+
+    Bars report their position in the figure's rows, aligned with `keys`;
+    sunburst sectors report their label, which is the key itself.
+    """
+    clicked = []
+    for point in points:
+        if 'point_index' in point:
+            clicked.append(keys[point['point_index']])
+        elif 'label' in point:
+            clicked.append(point['label'])
+    return clicked
+
+
+# Aggregates come sorted by period key, so labels appear in time order
+def _period_axis(frame):
+    return {'type': 'category', 'categoryorder': 'array', 'categoryarray': frame['period'].unique().tolist()}
+
+
+def _downsampled(frame, grain, by=None):
+    """Rows of a period aggregate to draw, at most MAX_POINTS per series of `by`."""
+    if len(frame) <= MAX_POINTS:
+        return frame
+    keys = frame[PERIOD_COLUMNS[grain]].to_numpy()
+    hours = frame['hours'].to_numpy()
+    if by is None:
+        series = [np.arange(len(frame))]
+    else:
+        series = frame.groupby(by, observed=True, sort=False).indices.values()
+    kept = [positions[lttb(keys[positions], hours[positions], MAX_POINTS)] for positions in series]
+    return frame.iloc[np.sort(np.concatenate(kept))]
+
+
+def _sampled_periods(frame, grain):
+    """Rows of the periods LTTB keeps from the total hours per period."""
+    key = PERIOD_COLUMNS[grain]
+    totals = frame.groupby(key)['hours'].sum()
+    if len(totals) <= MAX_POINTS:
+        return frame
+    periods = totals.index.to_numpy()
+    return frame[frame[key].isin(periods[lttb(periods, totals.to_numpy(), MAX_POINTS)])]
+
+
+def category_trends_line(time_category, grain):
+    time_category = _downsampled(time_category, grain, by='classification')
+    fig = px.line(
+        time_category,
+        x='period',
+        y='hours',
+        color='classification',
+        markers=True,
+        labels={'period': GRAINS[grain], 'hours': 'Hours', 'classification': 'Category'},
+        title="Category Trends Over Time"
+    )
+    fig.update_layout(
+        xaxis=_period_axis(time_category),
+        legend=dict(orientation="h", yanchor="bottom", y=-0.3),
+        margin=dict(l=40, r=40, t=60, b=80),
+        **BASE_LAYOUT
+    )
+    return fig
+
+
+def service_bar(service_hours, selected=()):
+    fig = px.bar(
+        service_hours,
+        x='service item',
+        y='hours',
+        color='hours',
+        labels={'service item': 'Service Item', 'hours': 'Total Hours'},
+        title="Total Hours by Service Item (Top 10)",
+        color_continuous_scale=px.colors.sequential.Plasma
+    )
+    fig.update_layout(
+        xaxis={'categoryorder':'total descending'},
+        margin=dict(l=40, r=40, t=60, b=40),
+        hoverlabel=HOVER_LABEL,
+        **BASE_LAYOUT
+    )
+    return _highlight_bars(fig, service_hours['service item'], selected)
+
+
+def distribution_pie(category_dist, title, palette):
+    fig = px.pie(
+        category_dist,
+        values='hours',
+        names='classification',
+        title=title,
+        color_discrete_sequence=palette
+    )
+    fig.update_layout(
+        legend=dict(orientation="h", y=-0.2),
+        margin=dict(l=20, r=20, t=60, b=20),
+        hoverlabel=HOVER_LABEL,
+        **BASE_LAYOUT
+    )
+    return fig
+
+
+def period_trend_line(period_hours, grain):
+    period_hours = _downsampled(period_hours, grain)
+    fig = px.line(
+        period_hours,
+        x='period',
+        y='hours',
+        markers=True,
+        labels={'period': GRAINS[grain], 'hours': 'Total Hours'},
+        title=f"Total Hours by {GRAINS[grain]}"
+    )
+    fig.update_layout(
+        xaxis=_period_axis(period_hours),
+        margin=dict(l=40, r=40, t=60, b=40),
+        hoverlabel=HOVER_LABEL,
+        **BASE_LAYOUT
+    )
+    return fig
+
+
+def period_heatmap(time_category, grain):
+    # Whole periods are left out, picked by LTTB on each period's total
+    time_category = _sampled_periods(time_category, grain)
+    fig = px.density_heatmap(
+        time_category,
+        x='period',
+        y='classification',
+        z='hours',
+        labels={'period': GRAINS[grain], 'classification': 'Category', 'hours': 'Hours'},
+        title=f"Hours by Category and {GRAINS[grain]}",
+        color_continuous_scale=px.colors.sequential.Viridis
+    )
+    fig.update_layout(
+        xaxis=_period_axis(time_category),
+        margin=dict(l=60, r=40, t=60, b=40),
+        hoverlabel=HOVER_LABEL,
+        **BASE_LAYOUT
+    )
+    return fig
+
+
+def user_bar(user_hours, selected=()):
+    fig = px.bar(
+        user_hours,
+        x='full_name',
+        y='hours',
+        color='hours',
+        labels={'full_name': 'Employee', 'hours': 'Total Hours'},
+        title="Total Hours by Employee (Top 10)",
+        color_continuous_scale=px.colors.sequential.Turbo
+    )
+    fig.update_layout(
+        xaxis={'categoryorder':'total descending'},
+        margin=dict(l=40, r=40, t=60, b=40),
+        hoverlabel=HOVER_LABEL,
+        **BASE_LAYOUT
+    )
+    return _highlight_bars(fig, user_hours['employee_id'], selected)
+
+
+def comparison_bar(comparison, column, label):
+    bars = comparison.melt(id_vars=column, value_vars=['hours', 'hours_previous'], var_name='window', value_name='total')
+    bars['window'] = bars['window'].map({'hours': 'This Period', 'hours_previous': 'Previous Period'})
+    fig = px.bar(
+        bars,
+        x=column,
+        y='total',
+        color='window',
+        barmode='group',
+        labels={column: label, 'total': 'Total Hours', 'window': ''},
+        title=f"Hours by {label}: This Period vs Previous Period",
+        color_discrete_sequence=['#6366f1', '#a5b4fc']
+    )
+    fig.update_layout(
+        legend=dict(orientation="h", y=-0.2),
+        margin=dict(l=40, r=40, t=60, b=40),
+        hoverlabel=HOVER_LABEL,
+        **BASE_LAYOUT
+    )
+    return fig
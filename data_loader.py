@@ -0,0 +1,437 @@
+"""Loading of the classified timesheet export.
+
+Parsing the CSV is the slowest part of a cold start, so the first parse
+writes a typed Arrow snapshot next to the CSV and later starts read that
+instead. The snapshot is tied to the CSV's size, mtime and content hash.
+
+The snapshot is memory-mapped rather than read into the heap: numeric, date
+and (with pandas' Arrow-backed strings) text columns are read-only views of
+the mapped file, so loading it costs no deserialization and the pages are
+shared through the OS page cache.
+
+The free-text columns are split off the frame at ingest and written to a
+side file of their own, see text_store.py, so the frame holds only the
+date, numeric and key columns.
+"""
+import glob
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from text_store import TEXT_COLUMNS, TextStore
+
+CSV_PATH = 'classified_timesheet.csv'
+
+# Files read from a directory of timesheet shards
+SHARD_PATTERN = '*.csv'
+
+# Low-cardinality string columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['classification', 'service item', 'fname', 'lname']
+
+# Bump when the snapshot layout changes so old snapshots are ignored
+SNAPSHOT_FORMAT = 5
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# Bytes hashed at the start of the file and just before the last read offset
+# to tell an append apart from a rewrite
+PREFIX_CHECK_SIZE = 64 * 1024
+
+
+def file_fingerprint(path, with_hash=True):
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        fingerprint['sha256'] = content_hash(path)
+    return fingerprint
+
+
+def content_hash(path, length=None):
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            size = HASH_CHUNK_SIZE if remaining is None else min(HASH_CHUNK_SIZE, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_paths(csv_path):
+    """Paths of the snapshot's frame, its text side file and its metadata."""
+    return csv_path + '.snapshot.arrow', csv_path + '.text.snapshot.arrow', csv_path + '.snapshot.json'
+
+
+def is_sharded(source):
+    return os.path.isdir(source) or glob.has_magic(source)
+
+
+def shard_paths(source):
+    """CSV files making up a timesheet source: one file, a directory or a glob, sorted by name."""
+    if not is_sharded(source):
+        return [source]
+    pattern = os.path.join(source, SHARD_PATTERN) if os.path.isdir(source) else source
+    return sorted(glob.glob(pattern))
+
+
+# Frames are kept sorted by date with unparseable dates first, so that the
+# int64 view of the date column is monotonic and ranges can be bisected.
+def date_order(dates):
+    """Positions that sort datetime64 values with NaT first, keeping ties in place."""
+    # NaT is the smallest int64
+    return np.argsort(np.asarray(dates).view('int64'), kind='stable')
+
+
+def sort_by_date(df):
+    return df.take(date_order(df['date'].to_numpy())).reset_index(drop=True)
+
+
+def split_text(df):
+    """The frame without its text columns, and those columns as a TextStore in the same row order."""
+    return df.drop(columns=[col for col in TEXT_COLUMNS if col in df.columns]), TextStore.from_frame(df)
+
+
+def isin_mask(series, values):
+    """Boolean mask of series values among `values`, comparing categorical codes rather than strings."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.categories.get_indexer(list(values))
+        return np.isin(series.cat.codes.to_numpy(), codes[codes >= 0])
+    return np.isin(series.to_numpy(), list(values))
+
+
+def employee_names(fname, lname):
+    return (fname.astype(object).fillna('').astype(str) + ' ' + lname.astype(object).fillna('').astype(str)).str.strip()
+
+
+def employee_table(frame):
+    """Lookup table of employee_id -> fname, lname and display name, indexed by id."""
+    table = frame.drop_duplicates('employee_id')[['employee_id', 'fname', 'lname']]
+    table = table.set_index('employee_id').sort_index()
+    table['fname'] = table['fname'].astype(object)
+    table['lname'] = table['lname'].astype(object)
+    table['name'] = employee_names(table['fname'], table['lname'])
+    return table
+
+
+def extend_employee_table(employees, frame):
+    """Employee table that also covers the employees first seen in `frame`."""
+    added = employee_table(frame)
+    if employees is None:
+        return added
+    added = added[~added.index.isin(employees.index)]
+    return pd.concat([employees, added]) if len(added) else employees
+
+
+def _employee_key(fname, lname):
+    return (None if pd.isna(fname) else fname, None if pd.isna(lname) else lname)
+
+
+def merge_employee_tables(tables, employees=None):
+    """One employee table for frames whose ids were assigned separately.
+
+    Returns the merged table and, for each input table, an array mapping its
+    ids to the merged ids. Employees are numbered in order of first
+    appearance across the tables. With `employees`, the table of a previous
+    version, the employees known there keep their ids and new ones are
+    numbered after them, so ids stay stable across reloads.
+    """
+    known, next_id = {}, 0
+    if employees is not None and not employees.empty:
+        known = {
+            _employee_key(fname, lname): employee_id
+            for employee_id, fname, lname in employees[['fname', 'lname']].itertuples()
+        }
+        next_id = int(employees.index.max()) + 1
+    merged, rows, mappings = set(), [], []
+    for table in tables:
+        mapping = np.full(int(table.index.max()) + 1 if len(table) else 0, -1, dtype='int32')
+        for employee_id, fname, lname in table[['fname', 'lname']].itertuples():
+            key = _employee_key(fname, lname)
+            if key not in known:
+                known[key] = next_id
+                next_id += 1
+            if known[key] not in merged:
+                merged.add(known[key])
+                rows.append((known[key], fname, lname))
+            mapping[employee_id] = known[key]
+        mappings.append(mapping)
+    table = pd.DataFrame(rows, columns=['employee_id', 'fname', 'lname']).set_index('employee_id').sort_index()
+    table['name'] = employee_names(table['fname'], table['lname'])
+    return table, mappings
+
+
+def assign_employee_ids(df, employees=None):
+    """Integer employee ids for each row of a freshly parsed frame.
+
+    Ids follow the order in which an employee first appears in the file and
+    new employees are numbered after those in `employees`, so ids stay
+    stable as rows are appended.
+    """
+    local_ids = df.groupby(['fname', 'lname'], sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    if employees is None or employees.empty:
+        return local_ids.astype('int32')
+    # Only the distinct employees of the new rows are matched by name
+    first_rows = df.loc[~pd.Series(local_ids).duplicated().to_numpy(), ['fname', 'lname']]
+    known = {
+        _employee_key(fname, lname): employee_id
+        for employee_id, fname, lname in employees[['fname', 'lname']].itertuples()
+    }
+    next_id = int(employees.index.max()) + 1
+    mapping = np.empty(len(first_rows), dtype='int32')
+    for local_id, (fname, lname) in enumerate(first_rows.astype(object).itertuples(index=False)):
+        key = _employee_key(fname, lname)
+        if key not in known:
+            known[key] = next_id
+            next_id += 1
+        mapping[local_id] = known[key]
+    return mapping[local_ids]
+
+
+def prepare_frame(df, employees=None):
+    df['date'] = pd.to_datetime(df['local_date'], errors='coerce')
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    # Employee ids are assigned before sorting, while rows are in file order
+    df['employee_id'] = assign_employee_ids(df, employees)
+    return sort_by_date(df)
+
+
+def _date_keys(df):
+    dates = df['date'].to_numpy()
+    return dates.view('int64'), np.datetime_data(dates.dtype)[0]
+
+
+def date_positions(df, start=None, stop=None):
+    """Row positions [lo, hi) of a date-sorted frame with start <= date < stop."""
+    keys, unit = _date_keys(df)
+    lo = 0 if start is None else keys.searchsorted(np.datetime64(start, unit).astype('int64'))
+    hi = len(keys) if stop is None else keys.searchsorted(np.datetime64(stop, unit).astype('int64'))
+    # NaT sorts first as the smallest int64, skip it whenever a bound is given
+    if start is None and stop is not None:
+        lo = keys.searchsorted(np.iinfo('int64').min, side='right')
+    return int(lo), int(max(lo, hi))
+
+
+def date_slice(df, start=None, stop=None):
+    lo, hi = date_positions(df, start, stop)
+    return df.iloc[lo:hi]
+
+
+def date_extent(df):
+    """First and last valid date of a date-sorted frame, or (NaT, NaT)."""
+    keys, _ = _date_keys(df)
+    first = keys.searchsorted(np.iinfo('int64').min, side='right')
+    if first == len(keys):
+        return pd.NaT, pd.NaT
+    return df['date'].iat[first], df['date'].iat[-1]
+
+
+# Limits a file to its first `limit` bytes, so a parse sees exactly the bytes
+# that were fingerprinted even if the file is appended to meanwhile
+class _PrefixReader(io.RawIOBase):
+    def __init__(self, f, limit):
+        self._f = f
+        self._remaining = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._f.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+
+def parse_csv(path, size=None):
+    if size is None:
+        return prepare_frame(pd.read_csv(path))
+    with open(path, 'rb') as f:
+        return prepare_frame(pd.read_csv(io.BufferedReader(_PrefixReader(f, size))))
+
+
+def read_chunks(path, chunk_rows, size=None, employees=None):
+    """Prepared frames of `chunk_rows` consecutive rows each, read one at a time.
+
+    Yields each frame along with the employee table so far; ids continue
+    across chunks as they would for the whole file, after those of
+    `employees` if given. With `size`, only the file's first `size` bytes
+    are read.
+    """
+    with open(path, 'rb') as f:
+        source = f if size is None else io.BufferedReader(_PrefixReader(f, size))
+        for chunk in pd.read_csv(source, chunksize=chunk_rows):
+            chunk = prepare_frame(chunk, employees)
+            employees = extend_employee_table(employees, chunk)
+            yield chunk, employees
+
+
+def append_marker(path, offset):
+    """Checksums of the file head and of the bytes just before `offset`."""
+    head_size = min(PREFIX_CHECK_SIZE, offset)
+    anchor_start = max(head_size, offset - PREFIX_CHECK_SIZE)
+    with open(path, 'rb') as f:
+        head = f.read(head_size)
+        f.seek(anchor_start)
+        anchor = f.read(offset - anchor_start)
+    return {
+        'head': hashlib.sha256(head).hexdigest(),
+        'anchor': hashlib.sha256(anchor).hexdigest(),
+        'ends_with_newline': offset == 0 or (anchor or head).endswith(b'\n'),
+    }
+
+
+def read_appended(path, offset, columns, employees=None):
+    """Parse the complete rows written after byte `offset`.
+
+    Returns the prepared rows (None if no complete row was appended) and the
+    offset just past the last row parsed.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return None, offset
+    rows = pd.read_csv(io.BytesIO(data[:end]), header=None, names=columns)
+    return prepare_frame(rows, employees), offset + end
+
+
+def appends_in_order(frame, rows):
+    """Whether `rows` can follow `frame` without breaking the date order."""
+    frame_dates, _ = _date_keys(frame)
+    new_dates, _ = _date_keys(rows)
+    return not len(frame_dates) or not len(new_dates) or new_dates[0] >= frame_dates[-1]
+
+
+def frames_in_order(frames):
+    """Whether concatenating date-sorted `frames` keeps the date order."""
+    frames = [frame for frame in frames if len(frame)]
+    return all(appends_in_order(frame, rows) for frame, rows in zip(frames, frames[1:]))
+
+
+def concat_frames(frames):
+    """Concatenate prepared frames, keeping categoricals and date order."""
+    first = frames[0]
+    columns = {}
+    for col in first.columns:
+        if isinstance(first[col].dtype, pd.CategoricalDtype):
+            columns[col] = pd.api.types.union_categoricals([frame[col] for frame in frames])
+    # Categoricals with differing categories would be concatenated as objects
+    combined = pd.concat([frame.drop(columns=list(columns)) for frame in frames], ignore_index=True)
+    for col, values in columns.items():
+        combined[col] = values
+    combined = combined[list(first.columns)]
+    if not frames_in_order(frames):
+        return sort_by_date(combined)
+    return combined
+
+
+def concat_order(frames):
+    """Positions that put the rows of `frames`, concatenated as they are, in the order concat_frames gives them."""
+    return date_order(np.concatenate([frame['date'].to_numpy() for frame in frames]))
+
+
+def append_frame(frame, rows):
+    return concat_frames([frame, rows])
+
+
+def read_snapshot(csv_path):
+    """Mapped frame and text of a current snapshot with its metadata, or None."""
+    data_path, text_path, meta_path = snapshot_paths(csv_path)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            return None
+        current = file_fingerprint(csv_path, with_hash=False)
+        if current['size'] != meta['size'] or current['mtime_ns'] != meta['mtime_ns']:
+            return None
+        if content_hash(csv_path) != meta['sha256']:
+            return None
+        return map_snapshot(data_path), map_text(text_path), meta
+    except (OSError, ValueError, KeyError, ImportError):
+        return None
+
+
+def map_snapshot(data_path):
+    """Frame backed by the memory-mapped snapshot file.
+
+    Snapshots are only ever replaced by renaming a new file over them, so a
+    mapping stays valid for as long as the frame references it.
+    """
+    with pa.memory_map(data_path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    # split_blocks keeps columns apart instead of consolidating them into
+    # copied 2D blocks
+    return table.to_pandas(split_blocks=True)
+
+
+def map_text(text_path):
+    """TextStore backed by the memory-mapped text side file; rows are read only when gathered."""
+    with pa.memory_map(text_path) as source:
+        return TextStore(pa.ipc.open_file(source).read_all())
+
+
+def write_snapshot(df, text, csv_path, fingerprint):
+    data_path, text_path, meta_path = snapshot_paths(csv_path)
+    meta = dict(fingerprint, format=SNAPSHOT_FORMAT)
+    try:
+        # Write to temporary names first so readers never see half a snapshot
+        df.reset_index(drop=True).to_feather(data_path + '.tmp', compression='uncompressed')
+        feather.write_feather(text.table, text_path + '.tmp', compression='uncompressed')
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(data_path + '.tmp', data_path)
+        os.replace(text_path + '.tmp', text_path)
+        os.replace(meta_path + '.tmp', meta_path)
+        return True
+    except (OSError, ValueError, ImportError):
+        # A read-only deployment still works, it just parses every cold start
+        return False
+
+
+def snapshot_current(csv_path, fingerprint):
+    """Whether the snapshot on disk was written from exactly the fingerprinted bytes."""
+    meta_path = snapshot_paths(csv_path)[-1]
+    try:
+        with open(meta_path) as f:
+            return json.load(f) == dict(fingerprint, format=SNAPSHOT_FORMAT)
+    except (OSError, ValueError):
+        return False
+
+
+def read_timesheet(csv_path=CSV_PATH):
+    """Load the timesheet frame and its text, along with the fingerprint of the bytes they came from."""
+    snapshot = read_snapshot(csv_path)
+    if snapshot is not None:
+        return snapshot
+
+    # Only the fingerprinted bytes are parsed, so rows appended meanwhile are
+    # left for the next incremental read
+    fingerprint = file_fingerprint(csv_path, with_hash=False)
+    fingerprint['sha256'] = content_hash(csv_path, length=fingerprint['size'])
+    df, text = split_text(parse_csv(csv_path, size=fingerprint['size']))
+    if write_snapshot(df, text, csv_path, fingerprint):
+        # Serve the mapped snapshot so the parsed copy can be freed
+        data_path, text_path, _ = snapshot_paths(csv_path)
+        df, text = map_snapshot(data_path), map_text(text_path)
+    return df, text, fingerprint
+
+
+def load_timesheet(csv_path=CSV_PATH):
+    df, _, _ = read_timesheet(csv_path)
+    return df
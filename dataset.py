@@ -0,0 +1,445 @@
+"""Process-wide timesheet dataset with incremental append ingest.
+
+The classifier appends rows to the timesheet export during the day. Rather
+than re-parsing the whole file, the dataset remembers the byte offset and
+row count it has read and folds only the appended tail into the frame, its
+text store, the rollup and the text index. A rewrite or truncation, detected
+through checksums of the file head and of the bytes before the last offset,
+triggers a full reload.
+
+StreamingTimesheetDataset is the out-of-core variant for exports larger than
+memory: it reads the file in chunks and folds each into the rollup, so only
+the rollup and the employee table stay resident. Raw rows are streamed from
+the file again when the Data Explorer asks for them.
+
+A directory or glob of shards, such as one export per month, is loaded by
+ShardedTimesheetDataset instead: each shard is parsed, rolled up and indexed
+on its own, cached under its fingerprint, and only changed shards are
+re-read, in parallel worker processes.
+
+One dataset is shared by every session of the server process. Sessions get
+the published frames themselves, never copies, and must treat them as
+read-only. With copy-on-write, modifying a slice taken from them copies the
+slice instead of writing through to the shared frame or the mapped file.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import rollup
+from data_loader import (
+    CSV_PATH, append_frame, append_marker, appends_in_order, concat_frames, concat_order, employee_table,
+    extend_employee_table, file_fingerprint, frames_in_order, is_sharded, map_snapshot, map_text,
+    merge_employee_tables, read_appended, read_chunks, read_timesheet, shard_paths, snapshot_current, snapshot_paths,
+    split_text,
+)
+from day_index import DayIndex
+from filter_index import FilterIndex
+from text_index import TextIndex
+from text_store import TextStore
+
+# Appends add a text index segment each; past this many it is rebuilt
+MAX_INDEX_SEGMENTS = 16
+
+# Copy-on-write is always on from pandas 3 and opt-in before that
+if int(pd.__version__.split('.')[0]) < 3:
+    try:
+        pd.set_option('mode.copy_on_write', True)
+    except (KeyError, AttributeError):
+        pass
+
+
+class RollupIndexes:
+    """Day and filter indexes of one rollup, built on first use.
+
+    Only the pandas query backend reads them, so a version served from
+    SQLite, or replaced before any session asks, never pays for them.
+    """
+
+    def __init__(self, rollup_df):
+        self._rollup = rollup_df
+        self._lock = threading.Lock()
+        self._day_index = None
+        self._filter_index = None
+
+    @property
+    def day_index(self):
+        with self._lock:
+            if self._day_index is None:
+                self._day_index = DayIndex(self._rollup)
+            return self._day_index
+
+    @property
+    def filter_index(self):
+        with self._lock:
+            if self._filter_index is None:
+                self._filter_index = FilterIndex(self._rollup)
+            return self._filter_index
+
+
+class LoadedData(NamedTuple):
+    # frame, text and text_index are None for a streaming dataset
+    frame: pd.DataFrame
+    text: TextStore
+    rollup: pd.DataFrame
+    text_index: TextIndex
+    employees: pd.DataFrame
+    indexes: RollupIndexes
+    version: int
+    loaded_at: datetime
+    load_seconds: float
+
+    @property
+    def day_index(self):
+        return self.indexes.day_index
+
+    @property
+    def filter_index(self):
+        return self.indexes.filter_index
+
+    def build_indexes(self):
+        """Build the pandas backend's indexes now rather than on the first query."""
+        self.indexes.day_index
+        self.indexes.filter_index
+
+
+def _next_version(current, frame, text, rollup_df, text_index, employees, started):
+    version = current.version + 1 if current else 1
+    return LoadedData(
+        frame, text, rollup_df, text_index, employees, RollupIndexes(rollup_df), version, datetime.now(),
+        time.perf_counter() - started,
+    )
+
+
+class Shard(NamedTuple):
+    fingerprint: dict
+    frame: pd.DataFrame
+    text: TextStore
+    rollup: pd.DataFrame
+    text_index: TextIndex
+    employees: pd.DataFrame
+
+
+class TimesheetDataset:
+    def __init__(self, csv_path=CSV_PATH):
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        self.current = None
+        self.offset = 0
+        self.rows = 0
+        self._mtime_ns = None
+        self._marker = None
+        self._columns = None
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            self._reload(time.perf_counter())
+        return self.current
+
+    def _reload(self, started):
+        frame, text, fingerprint = read_timesheet(self.csv_path)
+        # Ids are assigned in file order, renumber them so known employees keep theirs
+        employees, (mapping,) = merge_employee_tables([employee_table(frame)], self._employees())
+        frame = _with_employee_ids(frame, mapping)
+        self._columns = list(pd.read_csv(self.csv_path, nrows=0).columns)
+        self.offset = fingerprint['size']
+        self.rows = len(frame)
+        self._mtime_ns = fingerprint['mtime_ns']
+        self._marker = append_marker(self.csv_path, self.offset)
+        self._publish(frame, text, rollup.build_rollup(frame), TextIndex.build(text), employees, started)
+
+    def _employees(self):
+        return None if self.current is None else self.current.employees
+
+    def _publish(self, frame, text, rollup_df, text_index, employees, started):
+        # Swap everything together so readers never mix versions
+        self.current = _next_version(self.current, frame, text, rollup_df, text_index, employees, started)
+
+    def refresh(self):
+        """Pick up rows appended since the last read and return the current data."""
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                stat = os.stat(self.csv_path)
+            except OSError:
+                return self.current
+            if stat.st_size == self.offset and stat.st_mtime_ns == self._mtime_ns:
+                return self.current
+            if stat.st_size < self.offset or not self._is_append():
+                self._reload(started)
+                return self.current
+            try:
+                rows, offset = read_appended(self.csv_path, self.offset, self._columns, self.current.employees)
+            except ValueError:
+                # A tail that does not parse on its own means the file was rewritten
+                self._reload(started)
+                return self.current
+            self._mtime_ns = stat.st_mtime_ns
+            if rows is None:
+                return self.current
+            self.offset = offset
+            self.rows += len(rows)
+            self._marker = append_marker(self.csv_path, self.offset)
+            self._publish_append(rows, started)
+        return self.current
+
+    def _publish_append(self, rows, started):
+        current = self.current
+        rows, rows_text = split_text(rows)
+        frame = append_frame(current.frame, rows)
+        text = current.text.extended(rows_text)
+        # Row ids of existing rows only stay valid when the rows land at the end
+        in_order = appends_in_order(current.frame, rows)
+        if not in_order:
+            # append_frame re-sorted the rows by date, the text follows them
+            text = text.reordered(concat_order([current.frame, rows]))
+        if in_order and current.text_index.segment_count < MAX_INDEX_SEGMENTS:
+            text_index = current.text_index.extended(rows_text, len(current.frame))
+        else:
+            text_index = TextIndex.build(text)
+        self._publish(
+            frame,
+            text,
+            rollup.merge_rollup(current.rollup, rollup.build_rollup(rows)),
+            text_index,
+            extend_employee_table(current.employees, rows),
+            started,
+        )
+
+    def _is_append(self):
+        # The bytes already read must be unchanged and end on a row boundary
+        marker = append_marker(self.csv_path, self.offset)
+        return marker == self._marker and marker['ends_with_newline']
+
+
+class StreamingTimesheetDataset(TimesheetDataset):
+    """Dataset that keeps only the rollup and employee table in memory.
+
+    The file is read `chunk_rows` rows at a time and each chunk is folded
+    into the rollup before the next is read. Appends are picked up like in
+    TimesheetDataset. Raw rows are not kept; `chunks()` streams them from
+    the bytes behind the current version.
+    """
+
+    def __init__(self, csv_path=CSV_PATH, chunk_rows=100_000):
+        self.chunk_rows = chunk_rows
+        super().__init__(csv_path)
+
+    def _reload(self, started):
+        fingerprint = file_fingerprint(self.csv_path, with_hash=False)
+        rollup_df, employees, rows = None, None, 0
+        # Seeded with the current employees so known ones keep their ids
+        for chunk, employees in read_chunks(self.csv_path, self.chunk_rows, fingerprint['size'], self._employees()):
+            part = rollup.build_rollup(chunk)
+            rollup_df = part if rollup_df is None else rollup.merge_rollup(rollup_df, part)
+            rows += len(chunk)
+        if employees is not None:
+            # Only the employees still in the file are listed
+            employees = employees[employees.index.isin(rollup_df['employee_id'].unique())]
+        self._columns = list(pd.read_csv(self.csv_path, nrows=0).columns)
+        self.offset = fingerprint['size']
+        self.rows = rows
+        self._mtime_ns = fingerprint['mtime_ns']
+        self._marker = append_marker(self.csv_path, self.offset)
+        self._publish(None, None, rollup_df, None, employees, started)
+
+    def _publish_append(self, rows, started):
+        current = self.current
+        self._publish(
+            None,
+            None,
+            rollup.merge_rollup(current.rollup, rollup.build_rollup(rows)),
+            None,
+            extend_employee_table(current.employees, rows),
+            started,
+        )
+
+    def chunks(self):
+        """Prepared chunks of the rows read so far, with their employee tables."""
+        return read_chunks(self.csv_path, self.chunk_rows, self.offset, self.current.employees)
+
+
+def load_shard(path, detach=False):
+    """Parse, roll up and index one shard.
+
+    With `detach`, as in a worker process, the frame and text are left out
+    when the parent can map them from the shard's snapshot instead of
+    unpickling them.
+    """
+    frame, text, fingerprint = read_timesheet(path)
+    shard = Shard(fingerprint, frame, text, rollup.build_rollup(frame), TextIndex.build(text), employee_table(frame))
+    if detach and snapshot_current(path, fingerprint):
+        shard = shard._replace(frame=None, text=None)
+    return shard
+
+
+def load_shards(paths, workers):
+    if len(paths) > 1 and workers > 1:
+        # Spawned workers rather than forks of the threaded server process
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(workers, len(paths)), mp_context=context) as pool:
+            shards = list(pool.map(load_shard, paths, [True] * len(paths)))
+    else:
+        shards = [load_shard(path) for path in paths]
+    return [
+        shard if shard.frame is not None else _mapped_shard(shard, path)
+        for path, shard in zip(paths, shards)
+    ]
+
+
+def _mapped_shard(shard, path):
+    data_path, text_path, _ = snapshot_paths(path)
+    return shard._replace(frame=map_snapshot(data_path), text=map_text(text_path))
+
+
+class ShardedTimesheetDataset:
+    """Dataset over a directory or glob of timesheet shards, combined in name order."""
+
+    def __init__(self, source, workers=None):
+        self.source = source
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self.current = None
+        self._shards = {}
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            self._shards = {}
+            self._refresh()
+        return self.current
+
+    def refresh(self):
+        """Re-read shards added or changed since the last read and return the current data."""
+        with self._lock:
+            self._refresh()
+        return self.current
+
+    def _refresh(self):
+        started = time.perf_counter()
+        stats = {}
+        for path in shard_paths(self.source):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (stat.st_size, stat.st_mtime_ns)
+        if not stats:
+            if self.current is None:
+                raise FileNotFoundError(f"No timesheet shards found at {self.source}")
+            return
+        changed = [
+            path for path, stat in stats.items()
+            if path not in self._shards or stat != _shard_stat(self._shards[path])
+        ]
+        if self.current is not None and not changed and stats.keys() == self._shards.keys():
+            return
+        shards = dict(self._shards)
+        shards.update(zip(changed, load_shards(changed, self.workers)))
+        self._shards = {path: shards[path] for path in stats}
+        self._publish_shards(list(self._shards.values()), started)
+
+    def _publish_shards(self, shards, started):
+        # Known employees keep their ids when shards are added or changed
+        previous = None if self.current is None else self.current.employees
+        employees, mappings = merge_employee_tables([shard.employees for shard in shards], previous)
+        frames = [_with_employee_ids(shard.frame, mapping) for shard, mapping in zip(shards, mappings)]
+        frame = concat_frames(frames)
+        text = TextStore.concat([shard.text for shard in shards])
+        if frames_in_order(frames):
+            bases = [0]
+            for part in frames[:-1]:
+                bases.append(bases[-1] + len(part))
+            text_index = TextIndex.combined(zip((shard.text_index for shard in shards), bases))
+        else:
+            # Rows were re-sorted, so per-shard row ids no longer line up
+            text = text.reordered(concat_order(frames))
+            text_index = TextIndex.build(text)
+        rollup_df = rollup.combine_rollups([
+            _with_employee_ids(shard.rollup, mapping) for shard, mapping in zip(shards, mappings)
+        ])
+        self.current = _next_version(self.current, frame, text, rollup_df, text_index, employees, started)
+
+
+def _shard_stat(shard):
+    return shard.fingerprint['size'], shard.fingerprint['mtime_ns']
+
+
+def _with_employee_ids(frame, mapping):
+    if np.array_equal(mapping, np.arange(len(mapping))):
+        return frame
+    return frame.assign(employee_id=mapping[frame['employee_id'].to_numpy()])
+
+
+class DatasetRefresher:
+    """Serves the latest prepared version of a dataset.
+
+    With an `interval` in seconds, a daemon thread refreshes the dataset on
+    that schedule and runs `prepare` on each new version (to build derived
+    structures such as a query database) before swapping it in. Sessions
+    keep the previous version until then and never wait on a reload. An
+    interval of 0 refreshes on the caller's thread instead, and None never
+    refreshes.
+    """
+
+    def __init__(self, dataset, interval=None, prepare=None):
+        self.dataset = dataset
+        self.interval = interval
+        self.prepare = prepare
+        self.last_error = None
+        self._current = self._prepared(dataset.current)
+        self._stop = threading.Event()
+        self._thread = None
+        if interval:
+            self._thread = threading.Thread(target=self._run, name='dataset-refresher', daemon=True)
+            self._thread.start()
+
+    def _prepared(self, data):
+        if self.prepare is not None:
+            self.prepare(data)
+        return data
+
+    def latest(self):
+        if self.interval == 0:
+            self._swap(self.dataset.refresh())
+        return self._current
+
+    def _swap(self, data):
+        if data.version != self._current.version:
+            # A single reference assignment, so readers see one version or the other
+            self._current = self._prepared(data)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._swap(self.dataset.refresh())
+                self.last_error = None
+            except Exception as error:
+                # Keep serving the current version; the next tick retries
+                self.last_error = error
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def open_dataset(source=CSV_PATH, workers=None, stream_chunk_rows=None):
+    """Dataset for a single timesheet file, or for a directory or glob of shards.
+
+    With `stream_chunk_rows`, a single file is streamed in chunks of that
+    many rows instead of being loaded whole.
+    """
+    if is_sharded(source):
+        return ShardedTimesheetDataset(source, workers)
+    if stream_chunk_rows:
+        return StreamingTimesheetDataset(source, stream_chunk_rows)
+    return TimesheetDataset(source)
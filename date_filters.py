@@ -0,0 +1,66 @@
+"""Sidebar date range presets and date filtering of the loaded frames."""
+from datetime import datetime, timedelta
+
+from data_loader import date_slice
+
+# Date range options
+DATE_RANGE_OPTIONS = {
+    'all': 'All Time',
+    '3d': 'Last 3 Days',
+    '1w': 'Last Week', 
+    '1m': 'Last Month',
+    '3m': 'Last 3 Months',
+    'custom': 'Custom Range'
+}
+
+
+# Function to get start date based on selection
+def get_start_date(selection):
+    today = datetime.now().date()
+    if selection == '3d':
+        return today - timedelta(days=3)
+    elif selection == '1w':
+        return today - timedelta(days=7)
+    elif selection == '1m':
+        return today - timedelta(days=30)
+    elif selection == '3m':
+        return today - timedelta(days=90)
+    else:
+        return None  # All time
+
+
+# Dates selected as (start, stop) with stop exclusive; (None, None) keeps
+# every row, including those without a valid date
+def date_bounds(date_range, start_date, end_date):
+    if date_range == 'all':
+        return None, None  # No filtering needed
+    elif date_range == 'custom':
+        if start_date and end_date:
+            # Add one day to end_date to make it inclusive
+            return start_date, end_date + timedelta(days=1)
+    else:
+        # Handle preset ranges
+        if start_date:
+            return start_date, None
+    
+    return None, None
+
+
+# The selected window and the window of the same length just before it, as
+# (current, previous) bounds; None for all time, which has nothing before it
+def comparison_bounds(date_range, start_date, end_date):
+    start, stop = date_bounds(date_range, start_date, end_date)
+    if start is None:
+        return None
+    if stop is None:
+        stop = end_date + timedelta(days=1)
+    return (start, stop), (start - (stop - start), start)
+
+
+# Filter data based on date selection. Frames are sorted by date, so each
+# range is a binary search and the result is a slice rather than a copy.
+def filter_dataframe(df, date_range, start_date, end_date):
+    start, stop = date_bounds(date_range, start_date, end_date)
+    if start is None and stop is None:
+        return df
+    return date_slice(df, start, stop)
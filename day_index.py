@@ -0,0 +1,109 @@
+"""Per-day cumulative sums of the rollup, for constant-time window totals.
+
+For every day with entries in the rollup, the index holds running totals of
+hours and entries, overall and for each classification, service item and
+employee. Only the days present are kept, so a stray far-off date adds one
+row rather than every calendar day up to it. The bounds of a [start, stop)
+window are found among those days by binary search, and its total is the
+difference of two rows of the running totals, whatever the window's length,
+so moving the date window or comparing it with the previous one never
+rescans the rollup. Rows without a valid date are kept aside and counted
+only when no bound is given, as in date_filters.date_bounds.
+"""
+import numpy as np
+import pandas as pd
+
+from periods import MISSING_PERIOD, PERIOD_COLUMNS, day_number
+
+DIMENSIONS = ['classification', 'service item', 'employee_id']
+
+
+def _running_totals(positions, keys, values, days, width):
+    # Sums per (day, key) cell, then running sums down the days with a
+    # leading row of zeros so window [lo, hi) is totals[hi] - totals[lo]
+    cells = np.bincount(positions * width + keys, weights=values, minlength=days * width)
+    totals = np.zeros((days + 1, width), dtype=values.dtype)
+    np.cumsum(cells.reshape(days, width).astype(values.dtype), axis=0, out=totals[1:])
+    return totals
+
+
+class _Series:
+    """Running hours and entries of one dimension, one column per key."""
+
+    def __init__(self, rollup, dated, positions, days, column):
+        values = rollup[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            self.dtype = values.dtype
+            keys = values.cat.codes.to_numpy().astype('int64')
+            width = len(values.dtype.categories)
+        else:
+            self.dtype = None
+            keys = values.to_numpy().astype('int64')
+            width = int(keys.max(initial=0)) + 1
+        # Missing keys are left out, as groupby leaves them out
+        known = keys >= 0
+        hours = rollup['hours'].to_numpy(dtype='float64')
+        entries = rollup['entries'].to_numpy(dtype='int64')
+        in_days = dated & known
+        self.hours = _running_totals(positions[known[dated]], keys[in_days], hours[in_days], days, width)
+        self.entries = _running_totals(positions[known[dated]], keys[in_days], entries[in_days], days, width)
+        undated = ~dated & known
+        self.missing_hours = np.bincount(keys[undated], weights=hours[undated], minlength=width)
+        self.missing_entries = np.bincount(keys[undated], weights=entries[undated], minlength=width).astype('int64')
+
+    def keys(self, codes):
+        if self.dtype is None:
+            return codes
+        return pd.Categorical.from_codes(codes, dtype=self.dtype)
+
+
+class DayIndex:
+    def __init__(self, rollup):
+        day_keys = rollup[PERIOD_COLUMNS['day']].to_numpy()
+        dated = day_keys != MISSING_PERIOD
+        # The distinct days with entries, and the position of each row's day among them
+        self.day_keys, positions = np.unique(day_keys[dated].astype('int64'), return_inverse=True)
+        self.days = len(self.day_keys)
+        # The overall totals are the series of a dimension with a single key
+        overall = rollup[['hours', 'entries']].assign(key=np.zeros(len(rollup), dtype='int64'))
+        self._overall = _Series(overall, dated, positions, self.days, 'key')
+        self._series = {column: _Series(rollup, dated, positions, self.days, column) for column in DIMENSIONS}
+
+    def _span(self, bounds):
+        """Rows [lo, hi) of the running totals and whether undated rows count."""
+        start, stop = bounds
+        lo = 0 if start is None else int(self.day_keys.searchsorted(day_number(start)))
+        hi = self.days if stop is None else max(int(self.day_keys.searchsorted(day_number(stop))), lo)
+        return lo, hi, start is None and stop is None
+
+    def summary(self, bounds=(None, None)):
+        """Hours, entries and first and last dates with entries of a window."""
+        lo, hi, undated = self._span(bounds)
+        series = self._overall
+        hours = series.hours[hi, 0] - series.hours[lo, 0]
+        entries = series.entries[hi, 0] - series.entries[lo, 0]
+        if undated:
+            hours += series.missing_hours[0]
+            entries += series.missing_entries[0]
+        running = series.entries[:, 0]
+        # The first and last days at which the running count moves
+        first = int(running.searchsorted(running[lo], side='right')) - 1
+        last = int(running.searchsorted(running[hi], side='left')) - 1
+        if first >= hi or last < lo:
+            first_date = last_date = pd.NaT
+        else:
+            first_date = pd.Timestamp(np.datetime64(int(self.day_keys[first]), 'D'))
+            last_date = pd.Timestamp(np.datetime64(int(self.day_keys[last]), 'D'))
+        return {'hours': float(hours), 'entries': int(entries), 'first': first_date, 'last': last_date}
+
+    def hours_by(self, column, bounds=(None, None)):
+        """Hours per key of `column` in a window, for the keys with entries in it."""
+        lo, hi, undated = self._span(bounds)
+        series = self._series[column]
+        hours = series.hours[hi] - series.hours[lo]
+        entries = series.entries[hi] - series.entries[lo]
+        if undated:
+            hours = hours + series.missing_hours
+            entries = entries + series.missing_entries
+        codes = np.flatnonzero(entries)
+        return pd.DataFrame({column: series.keys(codes), 'hours': hours[codes]})
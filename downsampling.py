@@ -0,0 +1,45 @@
+"""Largest-Triangle-Three-Buckets downsampling of chart series.
+
+LTTB keeps the first and last point and splits the rest into equal buckets,
+keeping from each bucket the point that forms the largest triangle with the
+point kept before it and the mean of the next bucket. Peaks and troughs
+survive, so a long day-grain history drawn with a few hundred points looks
+like the full series.
+"""
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Sorted positions of the points of (x, y) to keep, at most `threshold` of them.
+
+    `x` must be increasing. Series no longer than `threshold` are kept whole.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # Bucket i covers [bounds[i], bounds[i + 1]); the one after the last
+    # bucket is the last point
+    bounds = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype('int64') + 1
+    bounds[-1] = n - 1
+    next_start, next_stop = bounds[1:], np.append(bounds[2:], n)
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    mean_x = ((sum_x[next_stop] - sum_x[next_start]) / (next_stop - next_start)).tolist()
+    mean_y = ((sum_y[next_stop] - sum_y[next_start]) / (next_stop - next_start)).tolist()
+
+    # Buckets hold a handful of points for any realistic history, where a
+    # plain loop beats numpy's per-call overhead
+    xs, ys, bounds = x.tolist(), y.tolist(), bounds.tolist()
+    kept = [0]
+    for i in range(threshold - 2):
+        xa, ya = xs[kept[-1]], ys[kept[-1]]
+        best_area, best = -1.0, bounds[i]
+        for j in range(bounds[i], bounds[i + 1]):
+            area = abs((xa - mean_x[i]) * (ys[j] - ya) - (xa - xs[j]) * (mean_y[i] - ya))
+            if area > best_area:
+                best_area, best = area, j
+        kept.append(best)
+    kept.append(n - 1)
+    return np.array(kept, dtype='int64')
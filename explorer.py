@@ -0,0 +1,206 @@
+"""Server-side pagination for the Data Explorer.
+
+Matching rows are tracked as an array of row positions into the date-sorted
+frame, and only the rows of the requested page are ever gathered, their
+text fetched by row id from the dataset's TextStore. Date
+order comes for free from the frame's sort order; hours order uses a
+partial selection of the top rows up to the requested page.
+
+Exports stream the whole selection in the same order, gathering and writing
+one chunk of rows at a time, so the file is never preceded by a full copy
+of the selected table.
+
+A streaming dataset keeps no rows in memory. Its selection is found by
+scanning the file's chunks again, keeping only the rows up to the requested
+page; exports of it are written in file order.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_loader import date_slice, isin_mask, split_text
+from text_index import TextIndex
+
+DISPLAY_COLUMNS = ['local_date', 'employee', 'hours', 'service item', 'notes', 'classification', 'classification_reason']
+
+SORT_OPTIONS = {
+    'date_desc': 'Date (Newest First)',
+    'date_asc': 'Date (Oldest First)',
+    'hours_desc': 'Hours (Highest First)',
+    'hours_asc': 'Hours (Lowest First)'
+}
+
+
+def search_positions(frame, row_ids):
+    """Positions in a date slice of the dataset frame of the given dataset row ids."""
+    positions = frame.index.get_indexer(row_ids)
+    return positions[positions >= 0]
+
+
+def matching_positions(frame, filters, positions=None):
+    """Positions of rows matching all (column, keys) filters, or None for all rows.
+
+    When `positions` is given, only those rows are considered.
+    """
+    for column, keys in filters:
+        values = frame[column] if positions is None else frame[column].iloc[positions]
+        mask = isin_mask(values, keys)
+        positions = np.flatnonzero(mask) if positions is None else positions[mask]
+    return positions
+
+
+def _take(positions, index):
+    return index if positions is None else positions[index]
+
+
+def _date_order(frame, positions, start, stop, descending):
+    # Frame rows are date-sorted with NaT first; NaT rows go last either way
+    count = len(frame) if positions is None else len(positions)
+    dates = frame['date'].to_numpy().view('int64')
+    missing = int(dates.searchsorted(np.iinfo('int64').min, side='right'))
+    if positions is not None:
+        missing = int(positions.searchsorted(missing))
+    valid = count - missing
+    index = np.arange(start, stop)
+    in_valid = index < valid
+    if descending:
+        mapped = np.where(in_valid, count - 1 - index, index - valid)
+    else:
+        mapped = np.where(in_valid, missing + index, index - valid)
+    return _take(positions, mapped)
+
+
+def _hours_order(frame, positions, start, stop, descending):
+    hours = frame['hours'].to_numpy(dtype='float64')
+    values = hours if positions is None else hours[positions]
+    # Negate for descending order; NaN sorts last in both directions
+    keys = -values if descending else values
+    k = min(stop, len(keys))
+    if k < len(keys):
+        # Hours tie constantly, so ties go by row position to keep the order
+        # total: every page then cuts the same ranking. Take the rows before
+        # the k-th value, then its ties in row order up to k rows.
+        kth = np.partition(keys, k - 1)[k - 1]
+        if np.isnan(kth):
+            before, tied = ~np.isnan(keys), np.isnan(keys)
+        else:
+            before, tied = keys < kth, keys == kth
+        before = np.flatnonzero(before)
+        top = np.concatenate((before, np.flatnonzero(tied)[:k - len(before)]))
+    else:
+        top = np.arange(len(keys))
+    ordered = top[np.lexsort((top, keys[top]))]
+    return _take(positions, ordered[start:stop])
+
+
+def page_positions(frame, positions, sort_by, page, page_size):
+    """Row positions of one page of matching rows in the requested order."""
+    count = len(frame) if positions is None else len(positions)
+    start = min(page * page_size, count)
+    stop = min(start + page_size, count)
+    if sort_by in ('date_desc', 'date_asc'):
+        return _date_order(frame, positions, start, stop, sort_by == 'date_desc')
+    return _hours_order(frame, positions, start, stop, sort_by == 'hours_desc')
+
+
+# Sort column and direction of each sort option, for scanned rows
+_SORT_KEYS = {
+    'date_desc': ('date', False),
+    'date_asc': ('date', True),
+    'hours_desc': ('hours', False),
+    'hours_asc': ('hours', True),
+}
+
+
+def page_frame(frame, text, rows, employees):
+    """Display table for the given row positions of a slice of the dataset frame and its `text`."""
+    page = frame.iloc[rows]
+    # The slice's index holds the dataset row ids
+    page = page.assign(employee=employees['name'].reindex(page['employee_id']).to_numpy(), **text.take(page.index))
+    return page[DISPLAY_COLUMNS]
+
+
+EXPORT_CHUNK_ROWS = 50_000
+
+
+def export_chunks(frame, text, positions, sort_by, employees, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Display tables of all matching rows in order, `chunk_rows` rows at a time."""
+    count = len(frame) if positions is None else len(positions)
+    rows = page_positions(frame, positions, sort_by, 0, count)
+    for start in range(0, count, chunk_rows):
+        yield page_frame(frame, text, rows[start:start + chunk_rows], employees)
+    if count == 0:
+        # Still yield an empty table so the file gets its header or schema
+        yield page_frame(frame, text, rows, employees)
+
+
+def write_csv(chunks, f):
+    """Write display tables to a binary file as one CSV."""
+    for i, chunk in enumerate(chunks):
+        f.write(chunk.to_csv(index=False, header=i == 0).encode('utf-8'))
+
+
+def _export_schema(chunk):
+    # Columns that are all missing in the first chunk would be typed null
+    # and clash with later chunks; text is the only thing they can hold
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+
+def write_parquet(chunks, f):
+    """Write display tables to a binary file as one Parquet row group each."""
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = _export_schema(chunk)
+                writer = pq.ParquetWriter(f, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def scan_matches(chunks, bounds, filters, query):
+    """Display tables, with their dates, of the matching rows of each chunk of a streamed file."""
+    start, stop = bounds
+    for chunk, employees in chunks:
+        rows, text = split_text(date_slice(chunk, start, stop).reset_index(drop=True))
+        positions = TextIndex.build(text).search(text, query) if query.strip() else None
+        positions = matching_positions(rows, filters, positions)
+        if positions is None:
+            positions = np.arange(len(rows))
+        if len(positions):
+            yield page_frame(rows, text, positions, employees).assign(date=rows['date'].to_numpy()[positions])
+
+
+def scan_count(matches):
+    return sum(len(rows) for rows in matches)
+
+
+def scan_page(matches, sort_by, page, page_size):
+    """One page of scanned rows in the requested order.
+
+    Only the rows up to the end of the page are kept between chunks.
+    """
+    column, ascending = _SORT_KEYS[sort_by]
+    keep = (page + 1) * page_size
+    best = pd.DataFrame(columns=DISPLAY_COLUMNS + ['date'])
+    for rows in matches:
+        best = pd.concat([best, rows], ignore_index=True) if len(best) else rows.reset_index(drop=True)
+        best = best.sort_values(column, ascending=ascending, na_position='last', kind='stable').head(keep)
+    return best.iloc[page * page_size:keep][DISPLAY_COLUMNS]
+
+
+def scan_export_chunks(matches):
+    """Display tables of scanned rows in file order, for export_chunks' writers."""
+    empty = True
+    for rows in matches:
+        empty = False
+        yield rows[DISPLAY_COLUMNS]
+    if empty:
+        yield pd.DataFrame(columns=DISPLAY_COLUMNS)
@@ -0,0 +1,86 @@
+"""Per-key row sets of the rollup, for the dashboard's cross-filter.
+
+Every view is filtered by the date window and any selected classifications,
+service items and employees at once. Rather than masking the whole rollup
+on each change, the index keeps, for every key of each of those dimensions,
+the sorted positions of the rollup rows holding it: one array of positions
+grouped by key and the offset at which each key's group starts. The rollup
+is sorted by date, so a window is a range of positions [lo, hi) and each
+key's rows in it are cut out by binary search. The rows of several keys of
+one dimension are the union of their sets; filters on several dimensions
+intersect, smallest set first. A filter change only touches the row sets of
+the selected keys.
+"""
+import numpy as np
+import pandas as pd
+
+from data_loader import date_positions
+from day_index import DIMENSIONS
+
+
+def _intersect(rows, other):
+    """Sorted positions in both sorted arrays, probing the larger with the smaller."""
+    if len(rows) > len(other):
+        rows, other = other, rows
+    if not len(rows):
+        return rows
+    found = np.minimum(other.searchsorted(rows), len(other) - 1)
+    return rows[other[found] == rows]
+
+
+class _Postings:
+    """Row positions of one dimension grouped by key, in row order within each key."""
+
+    def __init__(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            self.keys = values.cat.categories
+            codes = values.cat.codes.to_numpy()
+            width = len(self.keys)
+        else:
+            self.keys = None
+            codes = values.to_numpy().astype('int64')
+            width = int(codes.max(initial=-1)) + 1
+        # In the narrowest type that holds them, keys of up to 16 bits are
+        # radix sorted. Missing keys sort first and are dropped, as no
+        # filter selects them.
+        codes = codes.astype(np.min_scalar_type(-max(width, 1)))
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=width)
+        self.positions = order[len(order) - int(counts.sum()):]
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def _code(self, key):
+        if self.keys is not None:
+            return self.keys.get_indexer([key])[0]
+        return int(key) if 0 <= key < len(self.offsets) - 1 else -1
+
+    def rows(self, keys, lo, hi):
+        """Sorted positions within [lo, hi) of the rows holding any of `keys`."""
+        parts = []
+        for key in keys:
+            code = self._code(key)
+            if code < 0:
+                continue
+            rows = self.positions[self.offsets[code]:self.offsets[code + 1]]
+            parts.append(rows[rows.searchsorted(lo):rows.searchsorted(hi)])
+        if len(parts) == 1:
+            return parts[0]
+        # A row holds a single key, so the sets are disjoint
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=self.positions.dtype)
+
+
+class FilterIndex:
+    def __init__(self, rollup):
+        self.rollup = rollup
+        self._postings = {column: _Postings(rollup[column]) for column in DIMENSIONS}
+
+    def rows(self, bounds, filters=()):
+        """Sorted rollup positions in the date window matching every (column, keys) filter."""
+        lo, hi = date_positions(self.rollup, *bounds)
+        if not filters:
+            return np.arange(lo, hi)
+        sets = sorted((self._postings[column].rows(keys, lo, hi) for column, keys in filters), key=len)
+        rows = sets[0]
+        for other in sets[1:]:
+            rows = _intersect(rows, other)
+        return rows
@@ -0,0 +1,70 @@
+"""Integer period keys behind the time-grain selector.
+
+Each rollup row carries one key per grain, computed from its date with numpy
+datetime arithmetic: days, Monday-based (ISO) weeks, months, quarters and
+years counted from 1970. Keys increase with time, so grouping and sorting on
+them needs no string formatting; labels are only formatted for the distinct
+keys of an aggregate.
+"""
+from datetime import date
+
+import numpy as np
+
+GRAINS = {
+    'day': 'Day',
+    'week': 'Week',
+    'month': 'Month',
+    'quarter': 'Quarter',
+    'year': 'Year',
+}
+
+PERIOD_COLUMNS = {grain: f'{grain}_key' for grain in GRAINS}
+
+# Key of rows without a valid date; sorts before every real period
+MISSING_PERIOD = np.iinfo('int32').min
+
+
+def period_keys(dates):
+    """Key columns for every grain of a datetime64 series or array."""
+    values = np.asarray(dates, dtype='datetime64[ns]')
+    missing = np.isnat(values)
+    days = values.astype('datetime64[D]').astype('int64')
+    months = values.astype('datetime64[M]').astype('int64')
+    keys = {
+        'day': days,
+        # 1970-01-01 was a Thursday, so shifting by 3 days starts weeks on Monday
+        'week': (days + 3) // 7,
+        'month': months,
+        'quarter': months // 3,
+        'year': values.astype('datetime64[Y]').astype('int64'),
+    }
+    return {
+        PERIOD_COLUMNS[grain]: np.where(missing, MISSING_PERIOD, key).astype('int32')
+        for grain, key in keys.items()
+    }
+
+
+def day_number(value):
+    """Day key of a date, datetime or datetime64 value."""
+    return int(np.datetime64(value, 'D').astype('int64'))
+
+
+def period_label(key, grain):
+    if grain == 'day':
+        return str(np.datetime64(key, 'D'))
+    if grain == 'week':
+        year, week, _ = date.fromordinal(date(1970, 1, 1).toordinal() + key * 7 - 3).isocalendar()
+        return f"{year}-W{week:02d}"
+    if grain == 'month':
+        return f"{1970 + key // 12:04d}-{key % 12 + 1:02d}"
+    if grain == 'quarter':
+        return f"{1970 + key // 4}-Q{key % 4 + 1}"
+    return str(1970 + key)
+
+
+def period_labels(keys, grain):
+    """Label of each key, formatting every distinct key once."""
+    keys = np.asarray(keys)
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    labels = np.array([period_label(int(key), grain) for key in uniques], dtype=object)
+    return labels[inverse.reshape(-1)]
@@ -0,0 +1,123 @@
+"""Opt-in timing of the stages of a dashboard rerun.
+
+Each rerun gets a RerunProfile and wraps its named stages (loading,
+filtering, a view's aggregations, figure construction, rendering) in
+`profile.stage(...)`, which records the wall time, rows in and out and the
+change in process RSS. The records are shown in a sidebar panel and appended
+to a JSON-lines log, one line per stage. Sessions share the process, so RSS
+deltas of concurrent reruns overlap and are indicative only.
+
+Summarise a log with p50/p95 per stage:
+    python profiling.py profiling.jsonl
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+_log_lock = threading.Lock()
+
+
+def current_rss():
+    """Resident set size of the process in bytes, or None without /proc."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class RerunProfile:
+    def __init__(self, session_id=None):
+        self.rerun_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.view = None
+        self.started = time.perf_counter()
+        self.created = datetime.now().isoformat(timespec='milliseconds')
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Time the enclosed block; set record['rows_out'] inside it if known."""
+        record = {'stage': name, 'view': self.view, 'rows_in': rows_in, 'rows_out': None}
+        # Appended up front so nested stages are listed after their parent
+        self.stages.append(record)
+        rss = current_rss()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            after = current_rss()
+            record['rss_delta_bytes'] = after - rss if rss is not None and after is not None else None
+
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def records(self):
+        base = {'time': self.created, 'rerun': self.rerun_id, 'session': self.session_id}
+        total = {'stage': 'rerun', 'view': self.view, 'seconds': self.total_seconds()}
+        return [dict(base, **record) for record in self.stages + [total]]
+
+    def write(self, path):
+        lines = ''.join(json.dumps(record) + '\n' for record in self.records())
+        # One write per rerun, serialised across session threads
+        with _log_lock, open(path, 'a') as f:
+            f.write(lines)
+
+
+class NullProfile:
+    """Stand-in used when profiling is off; stages cost a context switch only."""
+
+    stages = ()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        yield {}
+
+    def write(self, path):
+        pass
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(path):
+    """Per stage count, p50, p95 and max seconds of a profiling log."""
+    timings = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                timings[record['stage']].append(record['seconds'])
+    return {
+        stage: {
+            'count': len(values),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'max': max(values),
+        }
+        for stage, values in timings.items()
+    }
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit(f"usage: {sys.argv[0]} <profiling log>")
+    summary = summarize(sys.argv[1])
+    print(f"{'stage':<40} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for stage, row in sorted(summary.items(), key=lambda item: -item[1]['p95']):
+        print(f"{stage:<40} {row['count']:>7} {row['p50'] * 1000:>10.1f} {row['p95'] * 1000:>10.1f} {row['max'] * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
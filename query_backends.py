@@ -0,0 +1,338 @@
+"""Query backends for the sidebar summary and the views' aggregations.
+
+Both backends answer the same queries over the day-grain rollup for a date
+range given as (start, stop) bounds, see date_filters.date_bounds, and the
+cross-filter given as (column, keys) pairs, each keeping the rows whose
+classification, service item or employee id is one of `keys`:
+
+- PandasQueries, the default, answers totals per window from the dataset's
+  day index (see day_index.py), and slices the in-memory rollup for the
+  period series, aggregating it with the functions in rollup.py. Under a
+  cross-filter, the matching rows are gathered through the dataset's
+  filter index (see filter_index.py) and aggregated instead.
+- SqliteQueries runs them as SQL against a SQLite copy of the rollup with
+  indexes on date, classification, service item and employee, so date and
+  key filters and groupbys are pushed down and only the small results come
+  back as frames. SqliteStore builds one database per dataset version.
+"""
+import atexit
+import os
+import sqlite3
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+import rollup
+from data_loader import date_slice
+from periods import PERIOD_COLUMNS, day_number, period_labels
+
+# Rollup columns as named in the database; the day key is the day itself
+SQL_COLUMNS = {
+    'date': 'day',
+    'classification': 'classification',
+    'service item': 'service_item',
+    'employee_id': 'employee_id',
+    **{column: column for column in PERIOD_COLUMNS.values()},
+    PERIOD_COLUMNS['day']: 'day',
+}
+
+SCHEMA = """
+CREATE TABLE daily_hours (
+    day INTEGER,
+    week_key INTEGER,
+    month_key INTEGER,
+    quarter_key INTEGER,
+    year_key INTEGER,
+    classification TEXT,
+    service_item TEXT,
+    employee_id INTEGER,
+    hours REAL,
+    entries INTEGER
+);
+CREATE TABLE employees (
+    employee_id INTEGER PRIMARY KEY,
+    fname TEXT,
+    lname TEXT,
+    name TEXT
+);
+CREATE INDEX daily_hours_day ON daily_hours (day, hours, entries);
+CREATE INDEX daily_hours_month ON daily_hours (month_key, classification, day, hours);
+CREATE INDEX daily_hours_classification ON daily_hours (classification, day, hours);
+CREATE INDEX daily_hours_service_item ON daily_hours (service_item, classification, day, hours, entries);
+CREATE INDEX daily_hours_employee ON daily_hours (employee_id, classification, day, hours, entries);
+"""
+# Every index covers the columns its queries read, so grouping along a key
+# index never falls back to row lookups in the table. The service item and
+# employee indexes are ordered by classification within each key for the
+# drilldowns' category breakdowns
+
+
+class PandasQueries:
+    def __init__(self, data):
+        self.data = data
+
+    def _rows(self, bounds, filters=()):
+        if filters:
+            return self.data.rollup.take(self.data.filter_index.rows(bounds, filters))
+        start, stop = bounds
+        if start is None and stop is None:
+            return self.data.rollup
+        return date_slice(self.data.rollup, start, stop)
+
+    def summary(self, bounds=(None, None), filters=()):
+        # The day index holds running totals of one dimension at a time, so
+        # a cross-filtered window is aggregated from its matching rows
+        if filters:
+            return rollup.summary(self._rows(bounds, filters))
+        return self.data.day_index.summary(bounds)
+
+    def _window_hours(self, column, bounds, filters):
+        if filters:
+            return rollup.hours_by(self._rows(bounds, filters), column)
+        return self.data.day_index.hours_by(column, bounds)
+
+    def _hours_by(self, column, bounds):
+        return self.data.day_index.hours_by(column, bounds).sort_values('hours', ascending=False)
+
+    def view_aggregates(self, view, bounds, grain='month', filters=()):
+        if filters:
+            return rollup.view_aggregates(view, self._rows(bounds, filters), self.data.employees, grain)
+        if view == 'category':
+            return {
+                'category_hours': self._hours_by('classification', bounds),
+                'time_category': rollup.period_category_hours(self._rows(bounds), grain),
+            }
+        if view == 'service':
+            return {'service_hours': self._hours_by('service item', bounds)}
+        if view == 'users':
+            hours = self.data.day_index.hours_by('employee_id', bounds).set_index('employee_id')['hours']
+            return {'user_hours': rollup.users_with_hours(hours, self.data.employees)}
+        return rollup.view_aggregates(view, self._rows(bounds), self.data.employees, grain)
+
+    def comparison(self, column, bounds, previous, filters=()):
+        """Hours per key of `column` in a window and in the `previous` window."""
+        return rollup.hours_comparison(
+            self._window_hours(column, bounds, filters), self._window_hours(column, previous, filters), column
+        )
+
+    def category_breakdown(self, column, bounds, filters=()):
+        """Hours of every key of `column` by classification in a window, see rollup.CategoryBreakdown."""
+        return rollup.CategoryBreakdown.from_rows(self._rows(bounds, filters), column)
+
+
+def _param(value):
+    # sqlite3 binds Python scalars only
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _where(bounds, filters=(), not_null=()):
+    # A NULL day never satisfies a bound, as unparseable dates never fall
+    # inside a date slice
+    start, stop = bounds
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('day >= ?')
+        params.append(day_number(start))
+    if stop is not None:
+        clauses.append('day < ?')
+        params.append(day_number(stop))
+    for column, keys in filters:
+        clauses.append(f'{SQL_COLUMNS[column]} IN ({", ".join("?" * len(keys))})')
+        params.extend(_param(key) for key in keys)
+    # Mirrors groupby, which leaves out missing keys
+    clauses.extend(f'{SQL_COLUMNS[column]} IS NOT NULL' for column in not_null)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+def _timestamp(day):
+    return pd.NaT if day is None else pd.Timestamp(np.datetime64(int(day), 'D'))
+
+
+class SqliteQueries:
+    def __init__(self, path):
+        self.path = path
+
+    def _query(self, sql, params=()):
+        connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        try:
+            return pd.read_sql_query(sql, connection, params=params)
+        finally:
+            connection.close()
+
+    def _hours_by(self, columns, bounds, filters=(), order='hours DESC'):
+        names = ', '.join(f'{SQL_COLUMNS[column]} AS "{column}"' for column in columns)
+        where, params = _where(bounds, filters, not_null=columns)
+        group = ', '.join(SQL_COLUMNS[column] for column in columns)
+        return self._query(
+            f'SELECT {names}, SUM(hours) AS hours FROM daily_hours{where} GROUP BY {group} ORDER BY {order}', params
+        )
+
+    def summary(self, bounds=(None, None), filters=()):
+        where, params = _where(bounds, filters)
+        row = self._query(
+            f'SELECT SUM(hours) AS hours, SUM(entries) AS entries, MIN(day) AS first, MAX(day) AS last '
+            f'FROM daily_hours{where}', params
+        ).iloc[0]
+        return {
+            'hours': 0.0 if pd.isna(row['hours']) else row['hours'],
+            'entries': 0 if pd.isna(row['entries']) else int(row['entries']),
+            'first': _timestamp(None if pd.isna(row['first']) else row['first']),
+            'last': _timestamp(None if pd.isna(row['last']) else row['last']),
+        }
+
+    def _period_hours(self, grain, bounds, filters, by=()):
+        order = ', '.join(map(str, range(1, len(by) + 2)))
+        hours = self._hours_by([PERIOD_COLUMNS[grain], *by], bounds, filters, order=order)
+        return hours.assign(period=period_labels(hours[PERIOD_COLUMNS[grain]], grain))
+
+    def view_aggregates(self, view, bounds, grain='month', filters=()):
+        if view == 'category':
+            return {
+                'category_hours': self._hours_by(['classification'], bounds, filters),
+                'time_category': self._period_hours(grain, bounds, filters, ['classification']),
+            }
+        if view == 'service':
+            return {'service_hours': self._hours_by(['service item'], bounds, filters)}
+        if view == 'trends':
+            return {
+                'period_hours': self._period_hours(grain, bounds, filters),
+                'time_category': self._period_hours(grain, bounds, filters, ['classification']),
+            }
+        if view == 'users':
+            where, params = _where(bounds, filters)
+            return {'user_hours': self._query(
+                'SELECT employee_id, fname, lname, name AS full_name, hours FROM employees '
+                f'JOIN (SELECT employee_id, SUM(hours) AS hours FROM daily_hours{where} GROUP BY employee_id) '
+                'USING (employee_id) ORDER BY hours DESC', params
+            )}
+        raise ValueError(f"Unknown view: {view}")
+
+    def category_breakdown(self, column, bounds, filters=()):
+        where, params = _where(bounds, filters, not_null=[column, 'classification'])
+        totals = self._query(
+            f'SELECT {SQL_COLUMNS[column]} AS "{column}", classification, SUM(hours) AS hours, SUM(entries) AS entries '
+            f'FROM daily_hours{where} GROUP BY 1, 2', params
+        )
+        return rollup.CategoryBreakdown.from_totals(totals, column)
+
+    def comparison(self, column, bounds, previous, filters=()):
+        return rollup.hours_comparison(
+            self._hours_by([column], bounds, filters), self._hours_by([column], previous, filters), column
+        )
+
+
+def write_database(path, data):
+    """Write the rollup and employee table of `data` to a new SQLite file."""
+    rows = data.rollup
+    missing = rows['date'].isna().to_numpy()
+    table = pd.DataFrame({
+        column: pd.array(rows[column].to_numpy(), dtype='Int64') for column in PERIOD_COLUMNS.values()
+    }).rename(columns={PERIOD_COLUMNS['day']: 'day'})
+    # Rows without a date have no period
+    table.loc[missing] = pd.NA
+    table = table.assign(**{
+        'classification': rows['classification'].astype(object),
+        'service_item': rows['service item'].astype(object),
+        'employee_id': rows['employee_id'].to_numpy(),
+        'hours': rows['hours'].to_numpy(),
+        'entries': rows['entries'].to_numpy(),
+    })
+    employees = data.employees.reset_index()[['employee_id', 'fname', 'lname', 'name']]
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        table.to_sql('daily_hours', connection, if_exists='append', index=False)
+        employees.to_sql('employees', connection, if_exists='append', index=False)
+        # Statistics let the planner choose between the date and key indexes
+        connection.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+
+
+class SqliteStore:
+    """Process-wide SQLite databases, one per dataset version.
+
+    The databases of the two newest versions are kept, so sessions still
+    holding the previous version can finish their queries while the next
+    one is published. A version is built once, outside the store's lock, so
+    sessions asking for a version that is already built never wait on
+    another's build. A session holding a version older than every kept one
+    is served the newest database rather than a rebuild. The files are
+    temporary and removed when the process exits.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or tempfile.gettempdir()
+        self._lock = threading.Lock()
+        self._databases = {}
+        self._building = {}
+        atexit.register(self.close)
+
+    def queries(self, data):
+        version = data.version
+        while True:
+            with self._lock:
+                path = self._database(version)
+                if path is not None:
+                    return SqliteQueries(path)
+                building = self._building.get(version)
+                if building is None:
+                    building = self._building[version] = threading.Event()
+                    break
+            # Another thread is building this version
+            building.wait()
+        path = None
+        try:
+            path = self._build(data)
+        finally:
+            # Waiters are woken in the same locked step that publishes the
+            # database, so none of them can find neither and build it again.
+            # After a failed build they retry it themselves
+            with self._lock:
+                if path is not None:
+                    self._publish(version, path)
+                del self._building[version]
+                building.set()
+        with self._lock:
+            return SqliteQueries(self._database(version))
+
+    def _database(self, version):
+        # Called with the lock held
+        if version in self._databases:
+            return self._databases[version]
+        if self._databases and version < max(self._databases):
+            return self._databases[max(self._databases)]
+        return None
+
+    def _build(self, data):
+        fd, path = tempfile.mkstemp(prefix='timesheet-', suffix='.sqlite', dir=self.directory)
+        os.close(fd)
+        os.remove(path)
+        try:
+            write_database(path, data)
+        except Exception:
+            _remove(path)
+            raise
+        return path
+
+    def _publish(self, version, path):
+        # Called with the lock held
+        self._databases[version] = path
+        for old in sorted(self._databases)[:-2]:
+            _remove(self._databases.pop(old))
+
+    def close(self):
+        with self._lock:
+            for path in self._databases.values():
+                _remove(path)
+            self._databases = {}
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
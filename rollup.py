@@ -0,0 +1,190 @@
+"""Pre-aggregated rollup of the timesheet shared by the analysis tabs.
+
+The rollup holds total hours and entry counts at day x classification x
+service item x employee grain. It is a small fraction of the raw table, so
+the chart tabs aggregate it instead of the raw rows. Each row also carries
+the integer period keys of its day for every time grain.
+"""
+import numpy as np
+import pandas as pd
+
+from data_loader import concat_frames, date_extent, sort_by_date
+from periods import MISSING_PERIOD, PERIOD_COLUMNS, period_keys, period_labels
+
+ROLLUP_KEYS = ['date', 'classification', 'service item', 'employee_id']
+
+# Categorical keys, grouped on their integer codes
+CATEGORICAL_KEYS = ['classification', 'service item']
+
+
+def build_rollup(df):
+    keys = pd.DataFrame({'date': df['date'].dt.normalize()})
+    for col in CATEGORICAL_KEYS:
+        keys[col] = df[col].cat.codes
+    keys['employee_id'] = df['employee_id']
+    keys['hours'] = df['hours']
+    rollup = (
+        keys.groupby(ROLLUP_KEYS, dropna=False, sort=False)['hours']
+        .agg(hours='sum', entries='size')
+        .reset_index()
+    )
+    # Restore the categoricals on the much smaller result
+    for col in CATEGORICAL_KEYS:
+        rollup[col] = pd.Categorical.from_codes(rollup[col], dtype=df[col].dtype)
+    return _with_periods(sort_by_date(rollup))
+
+
+def _with_periods(rollup):
+    return rollup.assign(**period_keys(rollup['date']))
+
+
+def _days_overlap(rollup, addition):
+    first_new, last_old = addition['date'].iat[0], rollup['date'].iat[-1]
+    return pd.isna(first_new) or pd.isna(last_old) or first_new <= last_old
+
+
+def combine_rollups(parts):
+    """Combine rollups of separately ingested rows, summing the keys they share."""
+    parts = [part for part in parts if len(part)] or parts[:1]
+    combined = concat_frames(parts)
+    # Parts covering later days than the part before cannot share a key with it
+    if any(_days_overlap(rollup, addition) for rollup, addition in zip(parts, parts[1:])):
+        combined = (
+            combined.groupby(ROLLUP_KEYS, observed=True, dropna=False, sort=False)[['hours', 'entries']]
+            .sum()
+            .reset_index()
+        )
+        combined = _with_periods(sort_by_date(combined))
+    return combined
+
+
+def merge_rollup(rollup, addition):
+    """Fold the rollup of newly ingested rows into an existing rollup."""
+    return combine_rollups([rollup, addition])
+
+
+def summary(rollup):
+    """Hours, entries and first and last valid dates of date-sorted rollup rows."""
+    first, last = date_extent(rollup)
+    return {'hours': float(rollup['hours'].sum()), 'entries': int(rollup['entries'].sum()), 'first': first, 'last': last}
+
+
+def hours_by(rollup, by):
+    return rollup.groupby(by, observed=True)['hours'].sum().reset_index()
+
+
+def category_hours(rollup):
+    return hours_by(rollup, 'classification').sort_values('hours', ascending=False)
+
+
+def service_hours(rollup):
+    return hours_by(rollup, 'service item').sort_values('hours', ascending=False)
+
+
+def _period_hours(rollup, grain, by=()):
+    # Grouped on the integer key in time order; labels added to the result
+    key = PERIOD_COLUMNS[grain]
+    hours = rollup.groupby([key, *by], observed=True)['hours'].sum().reset_index()
+    hours = hours[hours[key] != MISSING_PERIOD]
+    return hours.assign(period=period_labels(hours[key], grain))
+
+
+def period_hours(rollup, grain):
+    return _period_hours(rollup, grain)
+
+
+def period_category_hours(rollup, grain):
+    return _period_hours(rollup, grain, ['classification'])
+
+
+def user_hours(rollup, employees):
+    return users_with_hours(rollup.groupby('employee_id')['hours'].sum(), employees)
+
+
+def users_with_hours(hours, employees):
+    """Employee names alongside a series of hours indexed by employee id."""
+    users = employees.loc[hours.index, ['fname', 'lname', 'name']].rename(columns={'name': 'full_name'})
+    users['hours'] = hours.to_numpy()
+    return users.reset_index().sort_values('hours', ascending=False)
+
+
+def hours_comparison(current, previous, column):
+    """Hours per key of `column` in a window and in the window before it."""
+    compared = current.merge(previous, on=column, how='outer', suffixes=('', '_previous'))
+    compared = compared.fillna({'hours': 0.0, 'hours_previous': 0.0})
+    compared['change'] = compared['hours'] - compared['hours_previous']
+    return compared.sort_values('hours', ascending=False, ignore_index=True)
+
+
+class CategoryBreakdown:
+    """Hours of every key of a column by classification, in one date window.
+
+    A dense matrix with a row per key and a column per classification, so a
+    drilldown's category distribution is a row lookup rather than a masked
+    scan and groupby of the window's rows. Missing keys and classifications
+    are left out, as groupby leaves them out.
+    """
+
+    def __init__(self, keys, key_codes, classifications, class_codes, hours, entries):
+        self.keys = pd.Index(keys)
+        self.classifications = pd.Index(classifications)
+        known = (key_codes >= 0) & (class_codes >= 0)
+        width = len(self.classifications)
+        cells = key_codes[known].astype('int64') * width + class_codes[known]
+        size = len(self.keys) * width
+        self.hours = np.bincount(cells, weights=hours[known], minlength=size).reshape(len(self.keys), width)
+        self.entries = np.bincount(cells, weights=entries[known], minlength=size).reshape(len(self.keys), width)
+
+    @classmethod
+    def from_rows(cls, rows, column):
+        """Breakdown of rollup rows along a categorical column or the employee id."""
+        values = rows[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            keys, key_codes = values.cat.categories, values.cat.codes.to_numpy()
+        else:
+            key_codes = values.to_numpy().astype('int64')
+            keys = np.arange(int(key_codes.max(initial=-1)) + 1)
+        classifications = rows['classification']
+        return cls(
+            keys, key_codes, classifications.cat.categories, classifications.cat.codes.to_numpy(),
+            rows['hours'].to_numpy(dtype='float64'), rows['entries'].to_numpy(dtype='float64'),
+        )
+
+    @classmethod
+    def from_totals(cls, totals, column):
+        """Breakdown of hours and entries already summed per (column, classification)."""
+        key_codes, keys = pd.factorize(totals[column])
+        class_codes, classifications = pd.factorize(totals['classification'])
+        return cls(
+            keys, key_codes, classifications, class_codes,
+            totals['hours'].to_numpy(dtype='float64'), totals['entries'].to_numpy(dtype='float64'),
+        )
+
+    def distribution(self, key):
+        """Hours by classification of one key, largest first, as category_hours orders them."""
+        code = self.keys.get_indexer([key])[0]
+        if code < 0:
+            return pd.DataFrame({'classification': self.classifications[:0], 'hours': np.empty(0)})
+        columns = np.flatnonzero(self.entries[code])
+        hours = self.hours[code, columns]
+        order = np.argsort(-hours, kind='stable')
+        return pd.DataFrame({'classification': self.classifications[columns[order]], 'hours': hours[order]})
+
+
+def view_aggregates(view, rollup, employees, grain='month'):
+    """Aggregates behind one dashboard view, computed only when it is shown."""
+    if view == 'category':
+        return {
+            'category_hours': category_hours(rollup),
+            'time_category': period_category_hours(rollup, grain),
+        }
+    if view == 'service':
+        return {'service_hours': service_hours(rollup)}
+    if view == 'trends':
+        return {
+            'period_hours': period_hours(rollup, grain),
+            'time_category': period_category_hours(rollup, grain),
+        }
+    if view == 'users':
+        return {'user_hours': user_hours(rollup, employees)}
+    raise ValueError(f"Unknown view: {view}")
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rollup  # noqa: E402
+from day_index import DayIndex  # noqa: E402
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(3)
+    rows = 2000
+    dates = pd.Series(pd.date_range('2024-01-01', periods=rows, freq='2h'))
+    # A mistyped year far past the rest of the data, and a row without a date
+    dates[10] = pd.Timestamp('2204-03-01')
+    dates[20] = pd.NaT
+    return pd.DataFrame({
+        'date': dates,
+        'classification': pd.Categorical(rng.choice(['Audit', 'Tax', 'Payroll'], rows)),
+        'service item': pd.Categorical(rng.choice(['Filing', 'Review'], rows)),
+        'hours': rng.integers(1, 16, rows) * 0.25,
+        'employee_id': rng.integers(0, 6, rows),
+    })
+
+
+def test_outlier_date_keeps_index_to_days_present(frame):
+    rollup_df = rollup.build_rollup(frame)
+    index = DayIndex(rollup_df)
+    assert index.days == frame['date'].dt.normalize().nunique()
+    assert index._overall.hours.shape[0] == index.days + 1
+
+
+@pytest.mark.parametrize('bounds', [
+    (None, None),
+    (pd.Timestamp('2024-02-01'), pd.Timestamp('2024-03-01')),
+    (pd.Timestamp('2024-03-01'), None),
+    (None, pd.Timestamp('2100-01-01')),
+    (pd.Timestamp('2204-03-01'), pd.Timestamp('2204-03-02')),
+    (pd.Timestamp('2150-01-01'), pd.Timestamp('2160-01-01')),
+])
+def test_window_totals_match_the_rows(frame, bounds):
+    rollup_df = rollup.build_rollup(frame)
+    index = DayIndex(rollup_df)
+    start, stop = bounds
+    if start is None and stop is None:
+        rows = frame
+    else:
+        keep = frame['date'].notna()
+        if start is not None:
+            keep &= frame['date'] >= start
+        if stop is not None:
+            keep &= frame['date'] < stop
+        rows = frame[keep]
+    summary = index.summary(bounds)
+    assert summary['hours'] == pytest.approx(rows['hours'].sum())
+    assert summary['entries'] == len(rows)
+    if rows['date'].notna().any():
+        assert summary['first'] == rows['date'].min().normalize()
+        assert summary['last'] == rows['date'].max().normalize()
+    else:
+        assert pd.isna(summary['first']) and pd.isna(summary['last'])
+    by_category = index.hours_by('classification', bounds).set_index('classification')['hours']
+    expected = rows.groupby('classification', observed=True)['hours'].sum()
+    assert by_category.to_dict() == pytest.approx(expected.to_dict())
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import ShardedTimesheetDataset, StreamingTimesheetDataset, TimesheetDataset  # noqa: E402
+
+COLUMNS = ['local_date', 'fname', 'lname', 'hours', 'service item', 'notes', 'classification', 'classification_reason']
+
+
+def write_rows(path, people, date):
+    rows = [[date, fname, lname, 1.0, 'Review', 'note', 'Audit', 'reason'] for fname, lname in people]
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False)
+
+
+def names(data):
+    return data.employees['name'].to_dict()
+
+
+def test_backfilled_shard_keeps_existing_ids(tmp_path):
+    write_rows(tmp_path / '2024-02.csv', [('Bob', 'Jones')], '2024-02-01')
+    dataset = ShardedTimesheetDataset(str(tmp_path), workers=1)
+    assert names(dataset.current) == {0: 'Bob Jones'}
+    write_rows(tmp_path / '2024-01.csv', [('Zed', 'Zulu'), ('Bob', 'Jones')], '2024-01-01')
+    data = dataset.refresh()
+    assert names(data) == {0: 'Bob Jones', 1: 'Zed Zulu'}
+    assert set(data.rollup['employee_id']) == {0, 1}
+    zed = data.frame.loc[data.frame['fname'] == 'Zed', 'employee_id']
+    assert (zed == 1).all()
+
+
+def test_rewritten_file_keeps_existing_ids(tmp_path):
+    path = tmp_path / 'timesheet.csv'
+    write_rows(path, [('Bob', 'Jones'), ('Ann', 'Lee')], '2024-02-01')
+    for cls in (TimesheetDataset, StreamingTimesheetDataset):
+        write_rows(path, [('Bob', 'Jones'), ('Ann', 'Lee')], '2024-02-01')
+        dataset = cls(str(path))
+        assert names(dataset.current) == {0: 'Bob Jones', 1: 'Ann Lee'}
+        # A rewrite that puts a new employee first and drops another
+        write_rows(path, [('Zed', 'Zulu'), ('Ann', 'Lee')], '2024-01-01')
+        data = dataset.reload()
+        assert names(data) == {1: 'Ann Lee', 2: 'Zed Zulu'}
+        assert set(data.rollup['employee_id']) == {1, 2}
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import explorer  # noqa: E402
+
+
+@pytest.fixture
+def frame():
+    # Quarter-hour multiples tie constantly, and some hours are missing
+    rng = np.random.default_rng(7)
+    rows = 5000
+    hours = rng.integers(1, 16, rows) * 0.25
+    hours[::61] = np.nan
+    return pd.DataFrame({'date': pd.date_range('2024-01-01', periods=rows, freq='h'), 'hours': hours})
+
+
+@pytest.mark.parametrize('sort_by', ['hours_desc', 'hours_asc'])
+@pytest.mark.parametrize('selected', [False, True])
+def test_hours_pages_are_a_permutation_of_the_rows(frame, sort_by, selected):
+    positions = np.flatnonzero(np.arange(len(frame)) % 3 != 0) if selected else None
+    expected = np.arange(len(frame)) if positions is None else positions
+    page_size = 100
+    pages = [
+        explorer.page_positions(frame, positions, sort_by, page, page_size)
+        for page in range(-(-len(expected) // page_size))
+    ]
+    rows = np.concatenate(pages)
+    assert np.array_equal(np.sort(rows), expected)
+
+    # Pages follow one ranking: hours in the requested direction, NaN last,
+    # ties by row position
+    hours = frame['hours'].to_numpy()[rows]
+    keys = -hours if sort_by == 'hours_desc' else hours
+    assert np.array_equal(rows, rows[np.lexsort((rows, keys))])
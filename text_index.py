@@ -0,0 +1,207 @@
+"""Inverted index over the free-text columns of the timesheet.
+
+Maps each lower-cased alphanumeric token of `notes` and
+`classification_reason` to the sorted row ids containing it, so searches
+intersect posting lists instead of scanning every row. Quoted phrases are
+narrowed through the posting lists first and then verified on the
+candidate rows only, whose text is gathered from the dataset's TextStore.
+"""
+import copy
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from text_store import TEXT_COLUMNS
+
+TOKEN_PATTERN = r'[0-9a-z]+'
+
+_QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+_TOKEN_RE = re.compile(TOKEN_PATTERN)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def parse_query(query):
+    """Split a query into plain terms and quoted phrases, each a list of tokens."""
+    terms, phrases = [], []
+    for phrase, word in _QUERY_PATTERN.findall(query):
+        tokens = tokenize(phrase if phrase else word)
+        if len(tokens) > 1 or (phrase and tokens):
+            phrases.append(tokens)
+        elif tokens:
+            terms.append(tokens[0])
+    return terms, phrases
+
+
+def _phrase_pattern(tokens):
+    # Tokens separated by non-token characters, not embedded in longer tokens
+    return r'(?<![0-9a-z])' + r'[^0-9a-z]+'.join(map(re.escape, tokens)) + r'(?![0-9a-z])'
+
+
+# Bytes that make up tokens; everything else, including non-ASCII, separates
+_TOKEN_BYTES = np.zeros(256, dtype=bool)
+_TOKEN_BYTES[np.frombuffer(b'0123456789abcdefghijklmnopqrstuvwxyz', dtype=np.uint8)] = True
+
+
+def _tokenize_strings(strings):
+    """Tokenize an Arrow string array in bulk.
+
+    Works on the raw UTF-8 buffer: token bytes are kept, token boundaries
+    are found with shifted comparisons, and the kept bytes become a new
+    Arrow string array with one entry per token. Returns that array and the
+    index of the string each token came from.
+    """
+    text = pc.ascii_lower(strings)
+    offsets = np.frombuffer(text.buffers()[1], dtype=np.int64)[text.offset:text.offset + len(text) + 1]
+    data = np.frombuffer(text.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+    offsets = offsets - offsets[0]
+
+    is_token = _TOKEN_BYTES[data]
+    string_start = np.zeros(len(data) + 1, dtype=bool)
+    string_start[offsets] = True
+    previous_token = np.concatenate(([False], is_token[:-1])) & ~string_start[:-1]
+    next_token = np.concatenate((is_token[1:], [False])) & ~string_start[1:]
+    starts = np.flatnonzero(is_token & ~previous_token)
+    ends = np.flatnonzero(is_token & ~next_token) + 1
+
+    kept = np.cumsum(is_token)
+    token_offsets = np.concatenate((kept[starts] - 1, [kept[-1] if len(kept) else 0])).astype(np.int64)
+    tokens = pa.LargeStringArray.from_buffers(
+        len(starts), pa.py_buffer(token_offsets), pa.py_buffer(data[is_token].tobytes())
+    )
+    owners = np.searchsorted(offsets, starts, side='right') - 1
+    return tokens, owners, ends - starts
+
+
+def _column_tokens(values):
+    """Tokens of a text column, tokenizing each distinct value once.
+
+    Returns the row of each (row, token) occurrence, the distinct values'
+    tokens concatenated, and for each occurrence its index into them.
+    """
+    codes, uniques = pd.factorize(values)
+    strings = pa.array(pd.Series(uniques, dtype=object).astype(str).to_numpy(dtype=object), type=pa.large_string())
+    tokens, owners, _ = _tokenize_strings(strings)
+    counts = np.bincount(owners, minlength=len(uniques))
+    starts = np.cumsum(counts) - counts
+
+    rows = np.flatnonzero(codes >= 0)
+    row_counts = counts[codes[rows]]
+    row_ids = np.repeat(rows, row_counts)
+    # Position of each occurrence within its row's token list
+    within = np.arange(len(row_ids)) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+    token_index = np.repeat(starts[codes[rows]], row_counts) + within
+    return row_ids, tokens, token_index
+
+
+class _Segment:
+    def __init__(self, text, base):
+        row_ids, tokens, token_index = [], [], []
+        offset = 0
+        for col in TEXT_COLUMNS:
+            col_rows, col_tokens, col_index = _column_tokens(text.column(col))
+            row_ids.append(col_rows)
+            tokens.append(col_tokens)
+            token_index.append(col_index + offset)
+            offset += len(col_tokens)
+
+        encoded = pc.dictionary_encode(pa.concat_arrays(tokens) if tokens else pa.array([], type=pa.large_string()))
+        vocabulary = encoded.dictionary.to_pylist()
+        codes = encoded.indices.to_numpy(zero_copy_only=False)
+        codes = codes[np.concatenate(token_index)] if token_index else codes
+        row_ids = np.concatenate(row_ids) if row_ids else np.empty(0, dtype='int64')
+        # Sort by (token, row) through one combined key, dropping repeats of a
+        # token within a row
+        width = len(text) + 1
+        keys = np.sort(codes.astype('int64') * width + row_ids)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        codes, self.row_ids = keys // width, keys % width + base
+        bounds = np.searchsorted(codes, np.arange(len(vocabulary) + 1))
+        self.postings = {
+            token: (bounds[i], bounds[i + 1]) for i, token in enumerate(vocabulary)
+        }
+
+    def shifted(self, offset):
+        """The same segment with row ids moved by `offset`."""
+        if not offset:
+            return self
+        segment = copy.copy(self)
+        segment.row_ids = self.row_ids + offset
+        return segment
+
+    def lookup(self, token):
+        span = self.postings.get(token)
+        if span is None:
+            return np.empty(0, dtype='int64')
+        return self.row_ids[span[0]:span[1]]
+
+
+class TextIndex:
+    """Token to row id index; row ids are row positions in the indexed TextStore.
+
+    An index is never modified once built, so sessions still reading an older
+    dataset version keep a consistent view.
+    """
+
+    def __init__(self, segments=()):
+        self._segments = list(segments)
+
+    @classmethod
+    def build(cls, text):
+        return cls().extended(text, 0)
+
+    @classmethod
+    def combined(cls, parts):
+        """Index of stores concatenated in order, from (index, first row id) pairs."""
+        return cls(segment.shifted(base) for index, base in parts for segment in index._segments)
+
+    @property
+    def segment_count(self):
+        return len(self._segments)
+
+    def extended(self, text, base):
+        """New index that also covers the TextStore of rows appended at row id `base`."""
+        index = TextIndex(self._segments)
+        if len(text):
+            index._segments.append(_Segment(text, base))
+        return index
+
+    def lookup(self, token):
+        return np.concatenate(
+            [segment.lookup(token) for segment in self._segments] or [np.empty(0, dtype='int64')]
+        )
+
+    def search(self, text, query):
+        """Sorted row ids whose text matches every term and phrase of the query.
+
+        Returns None for an empty query.
+        """
+        terms, phrases = parse_query(query)
+        tokens = set(terms).union(*phrases)
+        if not tokens:
+            return None
+        # Intersect the rarest posting lists first
+        postings = sorted((self.lookup(token) for token in tokens), key=len)
+        rows = postings[0]
+        for posting in postings[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, posting, assume_unique=True)
+        for phrase in phrases:
+            if len(phrase) > 1 and len(rows):
+                rows = rows[self._phrase_mask(text, rows, phrase)]
+        return rows
+
+    def _phrase_mask(self, text, rows, phrase):
+        pattern = _phrase_pattern(phrase)
+        candidates = text.take(rows)
+        mask = np.zeros(len(rows), dtype=bool)
+        for col in TEXT_COLUMNS:
+            values = candidates[col].astype(object).fillna('').astype(str)
+            mask |= values.str.contains(pattern, case=False, regex=True).to_numpy()
+        return mask
@@ -0,0 +1,64 @@
+"""Side storage for the free-text columns of the timesheet.
+
+`notes` and `classification_reason` make up most of an export's bytes but
+are only shown in the Data Explorer and its downloads, and searched through
+the text index. Ingest splits them off the frame into a TextStore: an Arrow
+table in the frame's row order, memory-mapped from a side file next to the
+snapshot. Row ids are row positions in the dataset frame (the frame's
+index), and only the rows of a displayed page, an export chunk or a phrase
+search's candidates are ever gathered from it.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+TEXT_COLUMNS = ['notes', 'classification_reason']
+
+
+def _text_array(frame, column):
+    if column not in frame.columns:
+        return pa.nulls(len(frame), pa.large_string())
+    values = frame[column]
+    if not isinstance(values.dtype, pd.StringDtype):
+        # Older pandas keeps text as objects, and a column without any text
+        # is parsed as NaN floats
+        values = values.astype(object)
+    return pa.array(values, from_pandas=True).cast(pa.large_string())
+
+
+class TextStore:
+    """Text columns by row id. Like the text index, a store is never modified once built."""
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def from_frame(cls, frame):
+        return cls(pa.table({column: _text_array(frame, column) for column in TEXT_COLUMNS}))
+
+    @classmethod
+    def concat(cls, stores):
+        """Store of frames concatenated in order; the tables' chunks are shared, not copied."""
+        return cls(pa.concat_tables([store.table for store in stores]))
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def extended(self, other):
+        """New store with the rows of `other` appended."""
+        return TextStore.concat([self, other])
+
+    def reordered(self, order):
+        """New store holding the rows at positions `order`, gathered into memory."""
+        return TextStore(self.table.take(pa.array(order, type=pa.int64())))
+
+    def column(self, name):
+        """One text column of every row, as a series viewing the stored values."""
+        return self.table.column(name).to_pandas()
+
+    def take(self, rows):
+        """Text columns of the given row ids, as a frame indexed by them."""
+        rows = np.asarray(rows, dtype='int64')
+        frame = self.table.take(pa.array(rows)).to_pandas()
+        frame.index = rows
+        return frame